@@ -1,11 +1,18 @@
 import asyncio
 from concurrent.futures import ThreadPoolExecutor
 from threading import Lock
-from amplitude import Amplitude, BaseEvent 
+from amplitude import Amplitude, BaseEvent, Config
 from config import settings
 
 
-amplitude_client = Amplitude(api_key=settings.AMPLITUDE_API_KEY)
+# SDK копит события и отправляет их пачками: одно HTTPS-соединение на пачку
+amplitude_client = Amplitude(
+    api_key=settings.AMPLITUDE_API_KEY,
+    configuration=Config(
+        flush_queue_size=settings.AMPLITUDE_FLUSH_QUEUE_SIZE,
+        flush_interval_millis=settings.AMPLITUDE_FLUSH_INTERVAL_MILLIS
+    )
+)
 amplitude_executor = ThreadPoolExecutor(max_workers=4)  
 amplitude_lock = Lock() 
 
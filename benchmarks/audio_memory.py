@@ -0,0 +1,79 @@
+"""
+Бенчмарк выделения памяти на одно голосовое сообщение.
+
+Сравнивает прежний путь (bytes -> BytesIO -> getvalue() -> BufferedInputFile),
+отправку из памяти через MemoryVoiceFile и потоковую отправку StreamingVoiceFile.
+Сеть не используется: TTS-ответ и загрузка в Telegram имитируются.
+Аудиоданные создаются до начала замера, поэтому пик показывает только
+копии, которые делает сам путь отправки.
+
+Запуск:
+    python -m benchmarks.audio_memory --size 400000 --concurrency 50
+"""
+import argparse
+import asyncio
+import os
+import tracemalloc
+from io import BytesIO
+from typing import AsyncIterator
+from aiogram.types import BufferedInputFile
+from services.audio_buffer import MemoryVoiceFile, StreamingVoiceFile
+
+
+async def consume(input_file) -> int:
+    """Имитирует загрузку файла в Telegram: читает все куски"""
+    total = 0
+    async for chunk in input_file.read(None):
+        total += len(chunk)
+        await asyncio.sleep(0)
+    return total
+
+
+async def legacy_message(content: bytes) -> int:
+    audio_response = BytesIO(content)
+    audio_response.name = "output.mp3"
+    audio_response.seek(0)
+    voice_file = BufferedInputFile(audio_response.getvalue(), filename="response.ogg")
+    return await consume(voice_file)
+
+
+async def memory_message(content: bytes) -> int:
+    return await consume(MemoryVoiceFile(BytesIO(content), filename="response.ogg"))
+
+
+async def streaming_message(content: bytes) -> int:
+    async def source(chunk_size: int) -> AsyncIterator[bytes]:
+        # Куски потокового ответа приходят из сети отдельными объектами bytes
+        for offset in range(0, len(content), chunk_size):
+            yield content[offset:offset + chunk_size]
+
+    return await consume(StreamingVoiceFile(source, filename="response.ogg"))
+
+
+async def measure(factory, size: int, concurrency: int) -> tuple[int, int]:
+    contents = [os.urandom(size) for _ in range(concurrency)]
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    await asyncio.gather(*(factory(content) for content in contents))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak, peak // concurrency
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=400_000, help="Размер аудио в байтах")
+    parser.add_argument("--concurrency", type=int, default=50, help="Число одновременных сообщений")
+    args = parser.parse_args()
+
+    for name, factory in (
+        ("legacy", legacy_message),
+        ("memory", memory_message),
+        ("streaming", streaming_message),
+    ):
+        peak, per_message = await measure(factory, args.size, args.concurrency)
+        print(f"{name:>10}: peak {peak / 1024:10.1f} KiB, per message {per_message / 1024:8.1f} KiB")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,87 @@
+"""
+Задержка распознавания голосовых целиком и по частям в зависимости от длительности.
+
+Записи нужной длины синтезируются через TTS в Ogg/Opus, затем каждая
+распознается одним запросом к Whisper и через transcribe_long_audio.
+Отдельно выводится время нарезки на CPU. Использует реальный OpenAI API
+и ключ из .env.
+
+Запуск:
+    python -m benchmarks.chunked_stt --durations 30 60 120 180 --runs 2
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from io import BytesIO
+from config import settings
+from services.assistant_client_state import client
+from services.audio_to_text_service import _transcribe, transcribe_long_audio
+from services.ogg_opus import ogg_opus_duration, split_ogg_opus
+
+
+SENTENCES = (
+    "В последнее время я часто волнуюсь перед сном и долго не могу уснуть. ",
+    "Днем на работе все нормально, но вечером мысли начинают крутиться по кругу. ",
+    "Иногда сердце бьется быстрее, и я не понимаю, с чем это связано. ",
+    "Подскажи, пожалуйста, какие упражнения помогают успокоиться. ",
+)
+# Примерная скорость речи tts-1 в символах в секунду
+CHARS_PER_SECOND = 14
+
+
+async def synthesize(seconds: int) -> bytes:
+    text = ""
+    while len(text) < seconds * CHARS_PER_SECOND:
+        text += SENTENCES[len(text) % len(SENTENCES)]
+    response = await client.audio.speech.create(
+        model="tts-1",
+        voice="alloy",
+        input=text[:4096],
+        response_format="opus"
+    )
+    return response.content
+
+
+async def transcribe_whole(data: bytes) -> float:
+    audio_file = BytesIO(data)
+    audio_file.name = "audio.ogg"
+    started = time.perf_counter()
+    await _transcribe(audio_file)
+    return time.perf_counter() - started
+
+
+async def transcribe_chunked(data: bytes) -> float:
+    started = time.perf_counter()
+    await transcribe_long_audio(data)
+    return time.perf_counter() - started
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--durations", type=int, nargs="+", default=[30, 60, 120, 180])
+    parser.add_argument("--runs", type=int, default=2)
+    args = parser.parse_args()
+
+    print(
+        f"segment {settings.STT_SEGMENT_SECONDS} s, overlap {settings.STT_SEGMENT_OVERLAP_SECONDS} s, "
+        f"concurrency {settings.STT_MAX_CONCURRENCY}"
+    )
+    for seconds in args.durations:
+        data = await synthesize(seconds)
+        duration = ogg_opus_duration(data)
+
+        started = time.perf_counter()
+        segments = split_ogg_opus(data, settings.STT_SEGMENT_SECONDS, settings.STT_SEGMENT_OVERLAP_SECONDS)
+        split_ms = (time.perf_counter() - started) * 1000
+
+        whole = statistics.median([await transcribe_whole(data) for _ in range(args.runs)])
+        chunked = statistics.median([await transcribe_chunked(data) for _ in range(args.runs)])
+        print(
+            f"{duration:6.1f} s audio: {len(segments)} segments, split {split_ms:6.1f} ms, "
+            f"whole {whole:6.2f} s, chunked {chunked:6.2f} s"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
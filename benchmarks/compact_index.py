@@ -0,0 +1,172 @@
+"""
+Сравнение компактного mmap-индекса с Chroma: время открытия, память процесса,
+задержка запроса и recall@k относительно точного поиска во float32.
+
+Каждый движок измеряется в отдельном процессе, чтобы память и импорты
+не смешивались. Запросы — сохраненные векторы с детерминированным шумом,
+поэтому сеть не нужна. По умолчанию берется docx_vector_db; для оценки
+масштабирования можно сгенерировать синтетическую коллекцию.
+
+Запуск:
+    python -m benchmarks.compact_index
+    python -m benchmarks.compact_index --synthetic 100000 --dimensions 1536 --lists 256 --nprobe 16
+"""
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+from services.compact_index import CompactIndex, write_index
+
+
+def rss_kib() -> int:
+    """Текущий RSS процесса; без /proc — пиковый"""
+    try:
+        with open("/proc/self/status") as file:
+            for line in file:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def directory_size(path: str) -> int:
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _dirs, files in os.walk(path)
+        for name in files
+    )
+
+
+def measure(engine: str, path: str, queries_path: str, k: int, nprobe: int, collection: str) -> dict:
+    queries = np.load(queries_path)
+    rss_before = rss_kib()
+    started = time.perf_counter()
+    if engine == "chroma":
+        import chromadb
+
+        store = chromadb.PersistentClient(path=path).get_collection(collection)
+
+        def search(query: np.ndarray) -> list[str]:
+            return store.query(query_embeddings=[query.tolist()], n_results=k)["ids"][0]
+    else:
+        index = CompactIndex(path)
+
+        def search(query: np.ndarray) -> list[str]:
+            return [result.id for result in index.search_vector(query, k, nprobe or None)]
+    open_ms = (time.perf_counter() - started) * 1000
+
+    found, latencies = [], []
+    for query in queries:
+        started = time.perf_counter()
+        found.append(search(query))
+        latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+    return {
+        "open_ms": round(open_ms, 2),
+        "rss_delta_kib": rss_kib() - rss_before,
+        "query_ms_p50": round(statistics.median(latencies), 3),
+        "query_ms_p95": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 3),
+        "found": found,
+    }
+
+
+def create_synthetic(path: str, count: int, dimensions: int, seed: int = 0) -> None:
+    import chromadb
+
+    rng = np.random.default_rng(seed)
+    collection = chromadb.PersistentClient(path=path).create_collection("langchain")
+    for start in range(0, count, 5000):
+        end = min(start + 5000, count)
+        collection.add(
+            ids=[str(i) for i in range(start, end)],
+            embeddings=rng.standard_normal((end - start, dimensions), dtype=np.float32),
+            documents=[f"chunk {i}" for i in range(start, end)],
+        )
+
+
+def run_child(engine: str, path: str, queries_path: str, args) -> dict:
+    output = subprocess.run(
+        [
+            sys.executable, "-m", "benchmarks.compact_index", "--measure", engine,
+            "--path", path, "--queries-path", queries_path, "--k", str(args.k),
+            "--nprobe", str(args.nprobe), "--collection", args.collection,
+        ],
+        capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--source", default="docx_vector_db")
+    parser.add_argument("--collection", default="langchain")
+    parser.add_argument("--synthetic", type=int, default=0, help="Размер синтетической коллекции")
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--lists", type=int, default=0, help="Количество списков IVF")
+    parser.add_argument("--nprobe", type=int, default=0)
+    parser.add_argument("--measure", choices=("chroma", "compact"), help=argparse.SUPPRESS)
+    parser.add_argument("--path", help=argparse.SUPPRESS)
+    parser.add_argument("--queries-path", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(args.measure, args.path, args.queries_path, args.k, args.nprobe, args.collection)))
+        return
+
+    import chromadb
+
+    with tempfile.TemporaryDirectory() as workdir:
+        source = args.source
+        if args.synthetic:
+            source = os.path.join(workdir, "chroma")
+            create_synthetic(source, args.synthetic, args.dimensions)
+            args.collection = "langchain"
+
+        data = chromadb.PersistentClient(path=source).get_collection(args.collection).get(
+            include=["embeddings", "documents", "metadatas"]
+        )
+        vectors = np.asarray(data["embeddings"], dtype=np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        ids = list(data["ids"])
+
+        rng = np.random.default_rng(1)
+        picks = rng.integers(0, len(vectors), args.queries)
+        queries = vectors[picks] + rng.standard_normal((args.queries, vectors.shape[1]), dtype=np.float32) * 0.02
+        queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+        queries_path = os.path.join(workdir, "queries.npy")
+        np.save(queries_path, queries)
+
+        k = min(args.k, len(ids))
+        exact_scores = queries @ vectors.T
+        exact = [set(ids[i] for i in np.argsort(-row)[:k]) for row in exact_scores]
+
+        engines = {"chroma": source}
+        for dtype in ("float16", "int8"):
+            path = os.path.join(workdir, dtype)
+            write_index(path, vectors, ids, list(data["documents"]), list(data["metadatas"]), dtype, args.lists)
+            engines[f"compact-{dtype}"] = path
+
+        print(f"{len(ids)} vectors x {vectors.shape[1]}, {args.queries} queries, k={k}, lists={args.lists}, nprobe={args.nprobe}")
+        for name, path in engines.items():
+            result = run_child("chroma" if name == "chroma" else "compact", path, queries_path, args)
+            recall = statistics.mean(
+                len(exact[i] & set(found)) / k for i, found in enumerate(result["found"])
+            )
+            print(
+                f"{name:>16}: size {directory_size(path) / 1024:10.1f} KiB, open {result['open_ms']:8.2f} ms, "
+                f"rss +{result['rss_delta_kib'] / 1024:7.1f} MiB, p50 {result['query_ms_p50']:7.3f} ms, "
+                f"p95 {result['query_ms_p95']:7.3f} ms, recall@{k} {recall:.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
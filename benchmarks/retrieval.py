@@ -0,0 +1,205 @@
+"""
+Качество и скорость поиска по anxiety.docx для разных стратегий нарезки.
+
+Вместо OpenAI используется детерминированный локальный эмбеддинг
+(хэширование слов и символьных триграмм), поэтому результаты воспроизводимы
+без сети и сравнимы между коммитами. Для каждой стратегии измеряются
+recall@k по размеченным вопросам, время построения индекса Chroma,
+размер индекса на диске и задержка запроса. Результат пишется в JSON
+вместе с хэшем коммита; с --baseline выводится разница с прошлым прогоном.
+
+Запуск:
+    python -m benchmarks.retrieval --output retrieval.json
+    python -m benchmarks.retrieval --baseline retrieval.json
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+import platform
+import re
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timezone
+from langchain_core.embeddings import Embeddings
+from vector_store_service import build_vectorstore, load_docx_text, split_recursive, split_semantic
+
+
+# Вопрос и фрагмент документа, который должен оказаться в найденных чанках
+QUESTIONS = (
+    ("Чем патологическая тревожность отличается от обычной тревоги?", "в отличие от нормальной тревоги"),
+    ("Передается ли тревожность по наследству?", "наследственная предрасположенность"),
+    ("Какие нейромедиаторы связаны с тревогой?", "низкий уровень серотонина"),
+    ("Может ли тревога быть из-за гормонов или щитовидки?", "проблемы с щитовидной железой"),
+    ("Как стресс на работе и учеба влияют на тревожность?", "хронический стресс"),
+    ("Связана ли тревожность с детскими травмами?", "детские травмы"),
+    ("Может ли перфекционизм вызывать тревогу?", "перфекционизм и завышенные требования"),
+    ("Какие эмоциональные симптомы бывают при тревожности?", "постоянное беспокойство, раздражительность"),
+    ("Почему мне трудно сосредоточиться?", "трудности с концентрацией"),
+    ("Как тревога проявляется физически, сердце и пот?", "учащенное сердцебиение, потливость"),
+    ("У меня дрожь и напряжение в мышцах, это тревога?", "мышечное напряжение, дрожь"),
+    ("Может ли тревога вызывать тошноту и проблемы с желудком?", "проблемы с жкт"),
+    ("Я часто просыпаюсь ночью, это связано с тревогой?", "частые пробуждения ночью"),
+    ("Когда пора обращаться за помощью к специалисту?", "если тревога длится более 6 месяцев"),
+    ("Что такое когнитивно-поведенческая терапия?", "помогает изменить негативные мысли"),
+    ("Помогают ли дыхательные упражнения и медитация?", "дыхательные упражнения, медитация"),
+    ("Какие лекарства назначают при тревожности?", "антидепрессанты (сиозс)"),
+    ("Какие физические нагрузки помогают справиться с тревогой?", "ходьба, йога, плавание"),
+    ("Нужно ли отказаться от кофе и алкоголя?", "снижение потребления кофеина"),
+    ("Сколько часов нужно спать?", "нормализация режима сна"),
+    ("Как предотвратить тревожность, какие техники управления стрессом?", "дневник тревог"),
+    ("Чем могут помочь близкие люди?", "поддержка близких"),
+    ("Как избежать эмоционального выгорания?", "избегание эмоционального выгорания"),
+    ("Можно ли справиться с тревожностью?", "серьезное, но управляемое состояние"),
+)
+
+_WORDS = re.compile(r"\w+")
+
+
+def normalize(text: str) -> str:
+    return " ".join(text.lower().replace("ё", "е").split())
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Детерминированный эмбеддинг без сети: слова и символьные триграммы
+    хэшируются (blake2b, не зависит от PYTHONHASHSEED) в вектор фиксированной
+    размерности со знаком, вектор нормируется.
+    """
+
+    def __init__(self, dimensions: int = 512) -> None:
+        self.dimensions = dimensions
+
+    def _features(self, text: str) -> list[str]:
+        features = []
+        for word in _WORDS.findall(normalize(text)):
+            features.append(word)
+            padded = f"#{word}#"
+            features.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+        return features
+
+    def _embed(self, text: str) -> list[float]:
+        vector = [0.0] * self.dimensions
+        for feature in self._features(text):
+            digest = hashlib.blake2b(feature.encode(), digest_size=8).digest()
+            index = int.from_bytes(digest[:4], "little") % self.dimensions
+            vector[index] += 1.0 if digest[4] & 1 else -1.0
+        norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+        return [value / norm for value in vector]
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._embed(text)
+
+
+def directory_size(path: str) -> int:
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _dirs, files in os.walk(path)
+        for name in files
+    )
+
+
+def commit_hash() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def strategies(text: str, embeddings: Embeddings, sizes: list[int]) -> dict[str, list[str]]:
+    chunked = {
+        f"recursive-{size}": split_recursive(text, chunk_size=size, chunk_overlap=size // 5)
+        for size in sizes
+    }
+    chunked["semantic-percentile"] = split_semantic(text, embeddings)
+    return chunked
+
+
+def evaluate(name: str, chunks: list[str], embeddings: Embeddings, ks: list[int]) -> dict:
+    with tempfile.TemporaryDirectory() as directory:
+        started = time.perf_counter()
+        store = build_vectorstore(chunks, embeddings, persist_directory=directory, collection_name=name)
+        build_seconds = time.perf_counter() - started
+        index_bytes = directory_size(directory)
+
+        hits = {k: 0 for k in ks}
+        latencies = []
+        for question, evidence in QUESTIONS:
+            started = time.perf_counter()
+            found = store.similarity_search(question, k=max(ks))
+            latencies.append((time.perf_counter() - started) * 1000)
+            ranks = [i for i, doc in enumerate(found) if normalize(evidence) in normalize(doc.page_content)]
+            for k in ks:
+                hits[k] += bool(ranks) and ranks[0] < k
+
+    latencies.sort()
+    return {
+        "chunks": len(chunks),
+        "mean_chunk_chars": round(statistics.mean(len(chunk) for chunk in chunks), 1),
+        **{f"recall@{k}": round(hits[k] / len(QUESTIONS), 4) for k in ks},
+        "build_seconds": round(build_seconds, 4),
+        "index_bytes": index_bytes,
+        "query_ms_p50": round(statistics.median(latencies), 3),
+        "query_ms_p95": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 3),
+    }
+
+
+def print_table(results: dict, baseline: dict) -> None:
+    for name, metrics in results.items():
+        previous = baseline.get(name, {})
+        cells = []
+        for key, value in metrics.items():
+            cell = f"{key}={value}"
+            if key in previous and isinstance(value, (int, float)):
+                cell += f" ({value - previous[key]:+.4g})"
+            cells.append(cell)
+        print(f"{name:>20}: " + ", ".join(cells))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--document", default="anxiety.docx")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[250, 500, 1000, 1500])
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5])
+    parser.add_argument("--dimensions", type=int, default=512)
+    parser.add_argument("--output", help="Файл для результатов в JSON")
+    parser.add_argument("--baseline", help="Результаты прошлого прогона для сравнения")
+    args = parser.parse_args()
+
+    embeddings = HashingEmbeddings(args.dimensions)
+    text = load_docx_text(args.document)
+    results = {
+        name: evaluate(name, chunks, embeddings, sorted(args.k))
+        for name, chunks in strategies(text, embeddings, args.sizes).items()
+    }
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            baseline = json.load(file)["results"]
+    print_table(results, baseline)
+
+    report = {
+        "commit": commit_hash(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "document": args.document,
+        "embedding": f"hashing-{args.dimensions}",
+        "questions": len(QUESTIONS),
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
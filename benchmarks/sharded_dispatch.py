@@ -0,0 +1,80 @@
+"""
+Масштабирование по ядрам: пропускная способность при 1..N воркерах.
+
+Синтетические апдейты от множества пользователей распределяются по воркерам
+так же, как в supervisor.py (services.sharding.shard_for). Каждый апдейт
+требует фиксированного CPU-времени (разбор JSON + обработчик), сеть не используется.
+
+Запуск:
+    python -m benchmarks.sharded_dispatch --updates 4000 --cpu-ms 2
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from services.sharding import shard_for
+
+
+def make_update(update_id: int, user_id: int) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 1700000000,
+            "from": {"id": user_id, "is_bot": False, "first_name": "User"},
+            "chat": {"id": user_id, "type": "private"},
+            "voice": {"file_id": f"voice-{update_id}", "file_unique_id": f"u{update_id}", "duration": 5},
+        },
+    }
+
+
+def worker(queue: multiprocessing.Queue, cpu_ms: float) -> None:
+    while True:
+        raw = queue.get()
+        if raw is None:
+            return
+        update = json.loads(raw)
+        end = time.process_time() + cpu_ms / 1000
+        while time.process_time() < end:
+            pass
+        assert update["message"]["from"]["id"]
+
+
+def measure(workers: int, updates: list[dict], cpu_ms: float) -> float:
+    context = multiprocessing.get_context("spawn")
+    queues = [context.Queue() for _ in range(workers)]
+    processes = [context.Process(target=worker, args=(queue, cpu_ms)) for queue in queues]
+    for process in processes:
+        process.start()
+
+    started = time.perf_counter()
+    for update in updates:
+        queues[shard_for(update, workers)].put(json.dumps(update))
+    for queue in queues:
+        queue.put(None)
+    for process in processes:
+        process.join()
+    return len(updates) / (time.perf_counter() - started)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--updates", type=int, default=4000)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--cpu-ms", type=float, default=2.0, help="CPU-время обработки одного апдейта")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    updates = [make_update(i, 10_000 + i % args.users) for i in range(args.updates)]
+    baseline = None
+    workers = 1
+    while workers <= args.max_workers:
+        throughput = measure(workers, updates, args.cpu_ms)
+        baseline = baseline or throughput
+        print(f"workers={workers:>3}: {throughput:8.0f} updates/s, speedup x{throughput / baseline:4.2f}")
+        workers *= 2
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Сравнение форматов TTS: размер ответа и задержка для MP3 и Opus.
+
+Для каждого формата измеряет время до первого байта потокового ответа
+(когда Telegram может начать принимать загрузку) и полное время синтеза.
+Использует реальный OpenAI API и ключ из .env.
+
+Запуск:
+    python -m benchmarks.tts_formats --runs 3
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from services.assistant_client_state import client
+from services.ogg_opus import validate_ogg_opus
+
+
+SAMPLE_TEXT = (
+    "Тревожность — это естественная реакция организма на стресс. "
+    "Попробуйте медленно вдохнуть на четыре счета, задержать дыхание "
+    "и так же медленно выдохнуть. Повторите упражнение несколько раз."
+)
+
+
+async def synthesize(response_format: str, text: str) -> tuple[float, float, int]:
+    started = time.perf_counter()
+    first_byte = None
+    data = bytearray()
+    async with client.audio.speech.with_streaming_response.create(
+        model="tts-1",
+        voice="alloy",
+        input=text,
+        response_format=response_format
+    ) as response:
+        async for chunk in response.iter_bytes():
+            if first_byte is None:
+                first_byte = time.perf_counter() - started
+            data += chunk
+    total = time.perf_counter() - started
+
+    if response_format == "opus":
+        validate_ogg_opus(bytes(data))
+    return first_byte or total, total, len(data)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--text", default=SAMPLE_TEXT)
+    args = parser.parse_args()
+
+    for response_format in ("mp3", "opus"):
+        results = [await synthesize(response_format, args.text) for _ in range(args.runs)]
+        ttfb = statistics.median(r[0] for r in results)
+        total = statistics.median(r[1] for r in results)
+        size = statistics.median(r[2] for r in results)
+        print(
+            f"{response_format:>5}: size {size / 1024:7.1f} KiB, "
+            f"first byte {ttfb * 1000:7.0f} ms, total {total * 1000:7.0f} ms"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -18,6 +18,68 @@ class Settings(BaseSettings):
     
     AMPLITUDE_API_KEY: str
 
+    MOOD_CACHE_MAX_SIZE: int = 512
+    MOOD_CACHE_TTL: int = 3600
+    MOOD_CACHE_PHASH_DISTANCE: int = 4
+
+    TTS_RESPONSE_FORMAT: str = "opus"
+    TTS_STREAMING: bool = True
+
+    STT_LONG_AUDIO_SECONDS: float = 45.0
+    STT_SEGMENT_SECONDS: float = 30.0
+    STT_SEGMENT_OVERLAP_SECONDS: float = 1.5
+    STT_MAX_CONCURRENCY: int = 4
+
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_CONNECTIONS_PER_HOST: int = 50
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY: float = 60.0
+    HTTP_CONNECT_TIMEOUT: float = 10.0
+    HTTP_READ_TIMEOUT: float = 120.0
+    HTTP_DNS_CACHE_TTL: int = 300
+    HTTP2_ENABLED: bool = True
+    HTTP_POOL_METRICS_INTERVAL: float = 60.0
+
+    ASSISTANT_BACKGROUND_INIT: bool = True
+    ASSISTANT_MODEL: str = "gpt-4o"
+    ASSISTANT_LIGHT_MODEL: str = "gpt-4o-mini"
+
+    ROUTER_ENABLED: bool = True
+    ROUTER_RAG_THRESHOLD: float = 0.5
+    ROUTER_LIGHT_MAX_TOKENS: int = 400
+    ROUTER_QUALITY_SAMPLE_RATE: float = 0.0
+
+    THROTTLE_WINDOW_SECONDS: int = 60
+    THROTTLE_VOICE_LIMIT: int = 6
+    THROTTLE_PHOTO_LIMIT: int = 6
+    THROTTLE_TEXT_LIMIT: int = 20
+    SHED_MAX_IN_FLIGHT: int = 50
+    SHED_LATENCY_SECONDS: float = 45.0
+
+    USAGE_FLUSH_BATCH_SIZE: int = 100
+    USAGE_FLUSH_INTERVAL: float = 30.0
+
+    ADMIN_IDS: list[int] = []
+    SQL_ECHO: bool = False
+    LOOP_WATCHDOG_ENABLED: bool = True
+    LOOP_LAG_THRESHOLD: float = 0.25
+    PROFILE_OUTPUT_DIR: str = "profiles"
+    PROFILE_MAX_SECONDS: int = 120
+
+    WORKER_COUNT: int = 0
+    WORKER_HEARTBEAT_TIMEOUT: float = 30.0
+    WORKER_SHUTDOWN_TIMEOUT: float = 30.0
+    SUPERVISOR_HEALTH_INTERVAL: float = 5.0
+
+    CHECKPOINT_TTL: int = 86400
+    CHECKPOINT_MAX_REPLAYS: int = 3
+    SHUTDOWN_DRAIN_TIMEOUT: float = 20.0
+
+    # Значения SDK по умолчанию — 200 событий и 10 с; пачки крупнее и реже
+    # дают меньше HTTPS-запросов из потоков amplitude_executor
+    AMPLITUDE_FLUSH_QUEUE_SIZE: int = 1000
+    AMPLITUDE_FLUSH_INTERVAL_MILLIS: int = 30000
+
     model_config = SettingsConfigDict(
         env_file=".env", env_file_encoding="utf-8")
 
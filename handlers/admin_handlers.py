@@ -0,0 +1,58 @@
+from aiogram import F, Router, types
+from aiogram.filters import Command, CommandObject
+from config import settings
+from services.http_transport import format_pool_metrics
+from services.loop_monitor import loop_watchdog, sampling_profiler
+from services.model_router import format_route_stats
+
+
+admin_router = Router()
+admin_router.message.filter(F.from_user.id.in_(settings.ADMIN_IDS))
+
+
+@admin_router.message(Command("profile"))
+async def profile(message: types.Message, command: CommandObject) -> None:
+    """
+    Запускает семплирующий профайлер на заданное число секунд (/profile 30)
+    и присылает файл свернутых стеков для построения flamegraph.
+    """
+    try:
+        seconds = int(command.args or 10)
+    except ValueError:
+        await message.answer("Использование: /profile <секунды>")
+        return
+    seconds = max(1, min(seconds, settings.PROFILE_MAX_SECONDS))
+
+    await message.answer(f"Профилирую {seconds} с...")
+    try:
+        path = await sampling_profiler.profile(seconds)
+    except RuntimeError as e:
+        await message.answer(str(e))
+        return
+    await message.answer_document(
+        types.FSInputFile(path),
+        caption="Folded stacks: flamegraph.pl, speedscope или inferno"
+    )
+
+
+@admin_router.message(Command("watchdog"))
+async def watchdog(message: types.Message, command: CommandObject) -> None:
+    """Включает, выключает или показывает состояние детектора блокировок (/watchdog on|off)"""
+    action = (command.args or "").strip().lower()
+    if action == "on":
+        loop_watchdog.start()
+    elif action == "off":
+        loop_watchdog.stop()
+    await message.answer(loop_watchdog.status())
+
+
+@admin_router.message(Command("pools"))
+async def pools(message: types.Message) -> None:
+    """Показывает текущее состояние пулов соединений к OpenAI и Telegram"""
+    await message.answer(format_pool_metrics(message.bot.session))
+
+
+@admin_router.message(Command("routes"))
+async def routes(message: types.Message) -> None:
+    """Показывает количество и задержку ответов по маршрутам модели"""
+    await message.answer(format_route_stats())
@@ -17,11 +17,17 @@ from form import Form
 from pg_db.database import async_session_maker
 from services.assistant_client_service import client
 from services.audio_to_text_service import audio_to_text
-from services.assistant_client_service import get_single_response
+from services.audio_buffer import MemoryVoiceFile
+from services.checkpoint_service import CheckpointStore
+from services.model_router import answer_question
+from services.mood_cache_service import MoodResult, mood_cache, perceptual_hash
 from services.photo_service import analyze_mood
+from services.pipeline import Pipeline, StageFailed
+from services.values_extractor import extract_values
 from services.values_service import save_user_values, user_has_values
 from services.func_calling_service import VALUES_SYSTEM_PROMPT, tools
-from services.text_to_audio_service import text_to_audio
+from services.text_to_audio_service import text_to_audio, text_to_audio_stream
+from services.usage_service import track_usage
 
 
 user_router = Router()
@@ -66,14 +72,33 @@ async def process_text(message: types.Message) -> None:
 @user_router.message(lambda message: message.voice,
                      ~StateFilter(Form.collecting_values),
 )
-async def process_voice_question(message: types.Message, state: FSMContext) -> None:
+async def process_voice_question(
+    message: types.Message,
+    state: FSMContext,
+    event_update: types.Update,
+    checkpoints: CheckpointStore
+) -> None:
     """
     Обрабатывает голосовые сообщения: конвертирует их в текст,
     получает ответ от ассистента и отправляет ответ в виде голосового сообщения.
 
+    Независимые этапы (подтверждение, проверка ценностей в БД и синтез
+    вопроса о ценностях) выполняются параллельно с основной цепочкой.
+    Результаты этапов сохраняются в контрольную точку апдейта, поэтому
+    повторная обработка продолжается с последнего завершенного этапа.
+
     Параметры:
     - message (types.Message): Объект голосового сообщения от пользователя.
+    - event_update (types.Update): Апдейт, по ID которого хранится контрольная точка.
+    - checkpoints (CheckpointStore): Хранилище контрольных точек из данных диспетчера.
     """
+    checkpoint = checkpoints.for_update(event_update)
+    completed = await checkpoint.load()
+    # Повтор апдейта, который уже обработан как ответ о ценностях:
+    # после сохранения ценностей состояние сброшено, и повтор попал сюда
+    if completed.get("values:done") or "values:transcript" in completed:
+        return
+
     await async_amplitude_track(
         user_id=message.from_user.id,
         event_type="voice_message_received"
@@ -81,98 +106,153 @@ async def process_voice_question(message: types.Message, state: FSMContext) -> N
     
     voice: types.Voice = message.voice
     file_id: str = voice.file_id
+    telegram_id = message.from_user.id
+    pipeline = Pipeline("voice_question", checkpoint=checkpoint)
 
-    await message.answer("Секундочку, сейчас отвечу")
+    @pipeline.stage("ack", checkpoint=True)
+    async def ack() -> None:
+        await message.answer("Секундочку, сейчас отвечу")
 
-    # Скачиваем голосовое сообщение
-    file: types.File = await message.bot.get_file(file_id)
-    downloaded_file: BytesIO = await message.bot.download_file(file.file_path)
+    @pipeline.stage("download")
+    async def download() -> BytesIO:
+        # Скачиваем голосовое сообщение
+        file: types.File = await message.bot.get_file(file_id)
+        return await message.bot.download_file(file.file_path)
 
-    # Преобразуем аудио в текст
-    question_text: Optional[str] = await audio_to_text(downloaded_file)
+    @pipeline.stage("transcribe", "download", checkpoint=True)
+    async def transcribe(download: BytesIO) -> str:
+        # Преобразуем аудио в текст
+        question_text: Optional[str] = await audio_to_text(download)
+        if question_text is None:
+            raise StageFailed("voice_recognition_failed", "Не удалось распознать голосовое сообщение.")
+        return question_text
 
-    if question_text is None:
-        await async_amplitude_track(
-                user_id=message.from_user.id,
-                event_type="voice_recognition_failed"
-            )
-        await message.answer("Не удалось распознать голосовое сообщение.")
-        return
+    @pipeline.stage("answer", "transcribe", checkpoint=True)
+    async def answer(transcribe: str) -> str:
+        # Получаем ответ: простые вопросы отвечает легкая модель, вопросы о тревожности — ассистент
+        response_text, thread_id = await answer_question(transcribe)
+        if response_text is None:
+            raise StageFailed("assistant_response_failed", "Ошибка при получении ответа от ассистента.")
+        await state.update_data(thread_id=thread_id)
+        return response_text
 
-    # Получаем ответ от ассистента
-    response_text, thread_id = await get_single_response(question_text)
+    @pipeline.stage("send_answer", "ack", "answer", checkpoint=True)
+    async def send_answer(ack: None, answer: str) -> Optional[str]:
+        # Преобразуем текст ответа в аудио и отправляем его по мере синтеза
+        voice_file_id = None
+        try:
+            sent = await message.answer_voice(text_to_audio_stream(answer))
+            voice_file_id = sent.voice.file_id
+            voice_sent = True
+        except Exception as e:
+            print(f"Ошибка при отправке аудио: {e}")
+            voice_sent = False
 
-    if response_text is None:
-        await async_amplitude_track(
-                user_id=message.from_user.id,
-                event_type="assistant_response_failed"
-            )
-        await message.answer("Ошибка при получении ответа от ассистента.")
-        return
-    
-    
-    await state.update_data(thread_id=thread_id)
-
-
-    # Преобразуем текст ответа в аудио
-    audio_response: Optional[BytesIO] = await text_to_audio(response_text, api_key=settings.OPENAI_API_KEY)
+        if voice_sent:
+            await async_amplitude_track(
+                    user_id=telegram_id,
+                    event_type="voice_response_sent"
+                )
+        else:
+            await async_amplitude_track(
+                    user_id=telegram_id,
+                    event_type="audio_generation_failed"
+                )
+            await message.answer("Ошибка при генерации аудио.")
+        return voice_file_id
 
-    if audio_response:
-        audio_response.seek(0)  # Перемещаем указатель в начало
-        voice_file = types.BufferedInputFile(
-            audio_response.getvalue(), filename="response.ogg"
-        )
-        await message.answer_voice(voice_file)
-        await async_amplitude_track(
-                user_id=message.from_user.id,
-                event_type="voice_response_sent"
-            )
-    else:
-        await async_amplitude_track(
-                user_id=message.from_user.id,
-                event_type="audio_generation_failed"
-            )
-        await message.answer("Ошибка при генерации аудио.")
+    @pipeline.stage("has_values")
+    async def has_values() -> bool:
+        return await user_has_values(telegram_id)
 
-    # await asyncio.sleep(3)
-    
-    telegram_id = message.from_user.id
-    has_values = await user_has_values(telegram_id)
-    if not has_values:
-        await async_amplitude_track(
-                user_id=message.from_user.id,
-                event_type="values_collection_started"
-            )
+    @pipeline.stage("values_audio", "has_values")
+    async def values_audio(has_values: bool) -> Optional[BytesIO]:
+        # Заранее синтезируем персональный вопрос о ценностях
+        if has_values:
+            return None
         user_name = message.from_user.first_name
         values_question = f"{user_name}, ответь пожалуйста, какие твои жизненные ценности. Можешь назвать несколько."
-    
-        audio_response: Optional[BytesIO] = await text_to_audio(values_question, api_key=settings.OPENAI_API_KEY)
+        return await text_to_audio(values_question, api_key=settings.OPENAI_API_KEY)
 
-        if audio_response:
-            audio_response.seek(0)  # Перемещаем указатель в начало
-            voice_file = types.BufferedInputFile(
-                audio_response.getvalue(), filename="response.ogg"
+    @pipeline.stage("send_values", "send_answer", "has_values", "values_audio", checkpoint=True)
+    async def send_values(send_answer: Optional[str], has_values: bool, values_audio: Optional[BytesIO]) -> None:
+        if has_values:
+            return
+        await async_amplitude_track(
+                user_id=telegram_id,
+                event_type="values_collection_started"
             )
-            await message.answer_voice(voice_file)
+        if values_audio:
+            await message.answer_voice(MemoryVoiceFile(values_audio, filename="response.ogg"))
             
             await state.set_state(Form.collecting_values)
             await state.update_data(
                 conversation_history=[],
                 attempt_count=0
             )
-            
         else:
             await message.answer("Ошибка при генерации аудио.")
+
+    try:
+        await pipeline.run()
+    except StageFailed as e:
+        await async_amplitude_track(
+                user_id=telegram_id,
+                event_type=e.event_type
+            )
+        await message.answer(e.user_message)
+    finally:
+        await async_amplitude_track(
+            user_id=telegram_id,
+            event_type="voice_pipeline_timings",
+            event_props={**pipeline.timings_ms(), "resumed_stages": len(pipeline.resumed)}
+        )
         
         
+async def _save_values(
+    message: types.Message,
+    state: FSMContext,
+    values: List[str],
+    source: str
+) -> None:
+    """
+    Сохраняет ценности пользователя и завершает диалог о ценностях.
+
+    Параметры:
+    - values (List[str]): Список ценностей.
+    - source (str): Кто извлек ценности: "lexicon" (локальный разбор) или "llm".
+    """
+    async with async_session_maker() as session:
+        await save_user_values(session, message.from_user.id, values)
+    await async_amplitude_track(
+        user_id=message.from_user.id,
+        event_type="values_saved",
+        event_props={"values_count": len(values), "source": source}
+    )
+    await message.answer("Готово, Ваши ценности зафиксированы")
+    await state.clear()
+
+
 @user_router.message(lambda message: message.voice, StateFilter(Form.collecting_values))
 async def process_values(
     message: types.Message,
     state: FSMContext,
+    event_update: types.Update,
+    checkpoints: CheckpointStore
 ) -> None:
     """
     Обрабатывает голосовые сообщения от пользователя, которые содержат ответ на вопрос о жизненных ценностях.
+
+    Распознанный текст, ответ LLM и отправленный уточняющий вопрос сохраняются
+    в контрольную точку апдейта, поэтому повторная обработка их не повторяет.
     """
+    checkpoint = checkpoints.for_update(event_update)
+    completed = await checkpoint.load()
+    # Повтор уже обработанного апдейта; send_values означает, что это был вопрос,
+    # который сам перевел пользователя в состояние сбора ценностей
+    if completed.get("values:done") or "voice_question:send_values" in completed:
+        return
+
     await async_amplitude_track(
         user_id=message.from_user.id,
         event_type="values_processing_started"
@@ -181,14 +261,19 @@ async def process_values(
     voice: types.Voice = message.voice
     file_id: str = voice.file_id
 
-    await message.answer("Секундочку, сейчас обработаю твои ценности")
+    if "values:ack" not in completed:
+        await message.answer("Секундочку, сейчас обработаю твои ценности")
+        await checkpoint.save("values:ack", True)
 
-    # Скачиваем голосовое сообщение
-    file: types.File = await message.bot.get_file(file_id)
-    downloaded_file: BytesIO = await message.bot.download_file(file.file_path)
+    async def transcribe() -> Optional[str]:
+        # Скачиваем голосовое сообщение
+        file: types.File = await message.bot.get_file(file_id)
+        downloaded_file: BytesIO = await message.bot.download_file(file.file_path)
 
-    # Преобразуем аудио в текст
-    values_text: Optional[str] = await audio_to_text(downloaded_file)
+        # Преобразуем аудио в текст
+        return await audio_to_text(downloaded_file)
+
+    values_text: Optional[str] = await checkpoint.cached("values:transcript", transcribe)
 
     if values_text is None:
         await async_amplitude_track(
@@ -198,6 +283,13 @@ async def process_values(
         await message.answer("Не удалось распознать голосовое сообщение.")
         return
     
+    # Четкий список ценностей сохраняем сразу, без обращения к LLM
+    extracted_values = extract_values(values_text)
+    if extracted_values is not None:
+        await _save_values(message, state, extracted_values, source="lexicon")
+        await checkpoint.save("values:done", True)
+        return
+
     state_data = await state.get_data()
     conversation_history: List[Dict[str, str]] = state_data.get("conversation_history", [])
     attempt_count: int = state_data.get("attempt_count", 0)
@@ -207,56 +299,60 @@ async def process_values(
     
     # Формируем сообщения для API
     messages_for_api = [{"role": "system", "content": VALUES_SYSTEM_PROMPT}] + conversation_history
-    
+
+    async def request_values() -> dict:
+        async with track_usage("values_llm", "gpt-4") as usage:
+            response = await client.chat.completions.create(
+                model="gpt-4",
+                messages=messages_for_api,
+                tools=tools,
+                tool_choice="auto",
+                temperature=0.5,
+            )
+            usage.add_tokens(response.usage)
+        return response.choices[0].message.model_dump()
+
     try:
-        response = await client.chat.completions.create(
-            model="gpt-4",
-            messages=messages_for_api,
-            tools=tools,
-            tool_choice="auto",
-            temperature=0.5,
-        )
-        response_message = response.choices[0].message
+        response_message: dict = await checkpoint.cached("values:llm", request_values)
         
-        if response_message.tool_calls:
-            for tool_call in response_message.tool_calls:
-                if tool_call.function.name == "save_user_values":
-                    values = json.loads(tool_call.function.arguments)["values"]
-                    
-                    async with async_session_maker() as session:
-                        await save_user_values(session, message.from_user.id, values)
-                    await async_amplitude_track(
-                        user_id=message.from_user.id,
-                        event_type="values_saved",
-                        event_props={"values_count": len(values)}
-                    )
-                    await message.answer("Готово, Ваши ценности зафиксированы")
-                    await state.clear()
-                    return
+        for tool_call in response_message.get("tool_calls") or []:
+            if tool_call["function"]["name"] == "save_user_values":
+                values = json.loads(tool_call["function"]["arguments"])["values"]
+                await _save_values(message, state, values, source="llm")
+                await checkpoint.save("values:done", True)
+                return
                 
-        followup_question = response_message.content
-        conversation_history.append(response_message.model_dump())
+        followup_question = response_message["content"]
+        conversation_history.append(response_message)
         
         if attempt_count >= 2:
             await message.answer("Давайте прервёмся. Вы можете вернуться к этому позже.")
             await state.clear()
+            await checkpoint.save("values:done", True)
             return
-        
-        audio = await text_to_audio(followup_question, settings.OPENAI_API_KEY)
-        if audio:
-            await async_amplitude_track(
-                user_id=message.from_user.id,
-                event_type="followup_question_sent"
-            )
-            await message.answer_voice(
-                types.BufferedInputFile(audio.getvalue(), "followup.ogg")
-            )
+
+        async def send_followup() -> Optional[str]:
+            try:
+                sent = await message.answer_voice(
+                    text_to_audio_stream(followup_question, filename="followup.ogg")
+                )
+                await async_amplitude_track(
+                    user_id=message.from_user.id,
+                    event_type="followup_question_sent"
+                )
+                return sent.voice.file_id
+            except Exception as e:
+                print(f"Ошибка при отправке аудио: {e}")
+                return None
+
+        await checkpoint.cached("values:followup_voice", send_followup)
 
         # Обновляем состояние (увеличиваем счетчик попыток)
         await state.update_data(
             conversation_history=conversation_history,
             attempt_count=attempt_count + 1
         )
+        await checkpoint.save("values:done", True)
         
     except Exception as e:
         await async_amplitude_track(
@@ -268,24 +364,53 @@ async def process_values(
         await state.clear()
 
 
+async def _analyze_photo(message: types.Message, photo: types.PhotoSize) -> MoodResult:
+    """
+    Полный анализ фото: скачивание, поиск по перцептивному хэшу,
+    анализ настроения и озвучка ответа.
+    """
+    file = await message.bot.get_file(photo.file_id)
+    downloaded_file: BytesIO = await message.bot.download_file(file.file_path)
+    phash = await asyncio.to_thread(perceptual_hash, downloaded_file.getvalue())
+
+    cached = mood_cache.get_by_phash(phash)
+    if cached is not None:
+        return cached
+
+    # Формируем URL файла в Telegram
+    file_url = f"https://api.telegram.org/file/bot{settings.BOT_TOKEN}/{file.file_path}"
+
+    # Анализируем настроение с помощью OpenAI
+    mood_analysis = await analyze_mood(file_url)
+    result = MoodResult(mood_analysis=mood_analysis, phash=phash)
+
+    if "ЛИЦА НЕТ" not in mood_analysis and "Ошибка" not in mood_analysis:
+        response_text = f"Я определил твое настроение:\n\n{mood_analysis}"
+        audio_response: Optional[BytesIO] = await text_to_audio(response_text, api_key=settings.OPENAI_API_KEY)
+        if audio_response:
+            result.voice = audio_response.getvalue()
+
+    return result
+
+
 @user_router.message(lambda message: message.photo is not None)
 async def handle_photo(message: types.Message):
     """Хэндлер для обработки фотографий"""
     try:
         # Получаем файл фотографии (самое высокое качество)
         photo = message.photo[-1]
-        file = await message.bot.get_file(photo.file_id)
         
         await async_amplitude_track(
             user_id=message.from_user.id,
             event_type="photo_received"
         )
         
-        # Формируем URL файла в Telegram
-        file_url = f"https://api.telegram.org/file/bot{settings.BOT_TOKEN}/{file.file_path}"
-        
-        # Анализируем настроение с помощью OpenAI
-        mood_analysis = await analyze_mood(file_url)
+        # Повторно присланное фото берем из кэша, иначе анализируем заново
+        result = await mood_cache.get_or_compute(
+            photo.file_unique_id,
+            lambda: _analyze_photo(message, photo)
+        )
+        mood_analysis = result.mood_analysis
         
         # Формируем ответ пользователю
         if "ЛИЦА НЕТ" in mood_analysis:
@@ -306,14 +431,10 @@ async def handle_photo(message: types.Message):
                 event_type="mood_analyzed",
                 event_props={"mood_result": mood_analysis}
             )
-            response_text = f"Я определил твое настроение:\n\n{mood_analysis}"
-            audio_response: Optional[BytesIO] = await text_to_audio(response_text, api_key=settings.OPENAI_API_KEY)
-            if audio_response:
-                audio_response.seek(0)  # Перемещаем указатель в начало
-                voice_file = types.BufferedInputFile(
-                audio_response.getvalue(), filename="response.ogg"
+            if result.voice:
+                await message.answer_voice(
+                    MemoryVoiceFile(result.voice, filename="response.ogg")
                 )
-                await message.answer_voice(voice_file)
             else:
                 await message.answer("Ошибка при генерации аудио.")
                   
@@ -324,13 +445,3 @@ async def handle_photo(message: types.Message):
             event_props={"error": str(e)}
         )
         await message.answer("🚫 Произошла ошибка при обработке фото.")
-        
-    
-    
-    
-    
-    
-    
-    
-    
-    
\ No newline at end of file
@@ -1,27 +1,46 @@
 import asyncio
-from typing import Optional
-import redis.asyncio as redis
-from aiogram.fsm.storage.redis import RedisStorage
-from concurrent.futures import ThreadPoolExecutor
-from threading import Lock
-from aiogram import Bot, Dispatcher
-from amplitude import Amplitude
-from openai import AsyncOpenAI
-from config import settings
-from amplitude_dep import amplitude_executor
-from handlers.user_handlers import user_router
-from services.assistant_client_service import initialize_assistant
-from services.assistant_client_state import client
+from services.startup_report import startup_report
+
+# Тяжелые зависимости импортируются по отдельности, чтобы увидеть их вклад в холодный старт
+with startup_report.phase("import aiogram + redis"):
+    import redis.asyncio as redis
+    from aiogram import Bot, Dispatcher
+    from aiogram.fsm.storage.redis import RedisStorage
+
+with startup_report.phase("import openai"):
+    import openai
+
+with startup_report.phase("import sqlalchemy"):
+    import sqlalchemy.ext.asyncio
+
+with startup_report.phase("import bot modules"):
+    from config import settings
+    from amplitude_dep import amplitude_executor
+    from handlers.admin_handlers import admin_router
+    from handlers.user_handlers import user_router
+    from middlewares.journal import UpdateJournalMiddleware
+    from middlewares.throttling import ThrottlingMiddleware
+    from middlewares.usage import UsageContextMiddleware
+    from services.assistant_client_service import start_assistant_provisioning, wait_assistant_ready
+    from services.assistant_client_state import client
+    from services.checkpoint_service import CheckpointStore, UpdateJournal
+    from services.http_transport import create_telegram_session, report_pool_metrics
+    from services.loop_monitor import loop_watchdog
+    from services.usage_service import usage_accountant
+
+
+async def on_startup() -> None:
+    startup_report.mark("polling started")
+    startup_report.print_report()
 
 
 async def main() -> None:
-    await initialize_assistant(
-        client,
-        settings.OPENAI_API_KEY,
-        model="gpt-4o",
-        anxiety_file_path="anxiety.docx" 
-    )
-    
+    # Ассистент создается в фоне: обработчики ждут его только перед запросом к нему
+    start_assistant_provisioning()
+    if not settings.ASSISTANT_BACKGROUND_INIT:
+        with startup_report.phase("assistant provisioning"):
+            await wait_assistant_ready()
+
     redis_connection = redis.Redis(
         host=settings.REDIS_HOST,
         port=settings.REDIS_PORT,
@@ -29,17 +48,54 @@ async def main() -> None:
         password=settings.REDIS_PASSWORD,
         decode_responses=True
     )
-    
+
     storage = RedisStorage(redis_connection)
-    
-    bot = Bot(token=settings.BOT_TOKEN)
+
+    bot = Bot(token=settings.BOT_TOKEN, session=create_telegram_session())
     dp = Dispatcher(storage=storage)
+    dp["checkpoints"] = CheckpointStore(redis_connection)
+    journal = UpdateJournal(redis_connection, "main")
+    throttling = ThrottlingMiddleware(redis_connection)
+    dp.update.outer_middleware(UsageContextMiddleware())
+    dp.update.outer_middleware(UpdateJournalMiddleware(journal))
+    dp.message.middleware(throttling)
+    dp.include_router(admin_router)
     dp.include_router(user_router)
-    
+    dp.startup.register(on_startup)
+
+    pool_metrics_task = asyncio.create_task(
+        report_pool_metrics(bot.session, settings.HTTP_POOL_METRICS_INTERVAL)
+    )
+    usage_task = asyncio.create_task(usage_accountant.run())
+    if settings.LOOP_WATCHDOG_ENABLED:
+        loop_watchdog.start()
+
+    # Апдейты, прерванные прошлой остановкой, продолжаются с последней контрольной точки
+    replay_tasks = [
+        asyncio.create_task(dp.feed_raw_update(bot, update))
+        for update in await journal.pending()
+    ]
+
     try:
-        await dp.start_polling(bot)
+        # Сессию бота закрываем сами: после остановки поллинга обработчики еще отправляют ответы
+        await dp.start_polling(bot, close_bot_session=False)
     finally:
-        await redis_connection.close() 
+        # Новые апдейты больше не принимаются, даем начатым обработчикам завершиться
+        if not await throttling.drain(settings.SHUTDOWN_DRAIN_TIMEOUT):
+            print(
+                f"Не дождались {throttling.in_flight} обработчиков за "
+                f"{settings.SHUTDOWN_DRAIN_TIMEOUT} с, они продолжатся после перезапуска"
+            )
+        for task in replay_tasks:
+            task.cancel()
+        await asyncio.gather(*replay_tasks, return_exceptions=True)
+        loop_watchdog.stop()
+        pool_metrics_task.cancel()
+        usage_task.cancel()
+        await asyncio.gather(usage_task, return_exceptions=True)
+        await bot.session.close()
+        await client.close()
+        await redis_connection.close()
         amplitude_executor.shutdown(wait=True)
 
 if __name__ == "__main__":
@@ -0,0 +1,48 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+from services.checkpoint_service import UpdateJournal
+
+
+class UpdateJournalMiddleware(BaseMiddleware):
+    """
+    Записывает голосовые апдейты в журнал на время обработки.
+
+    Апдейт, обработка которого была прервана остановкой процесса, остается
+    в журнале и повторяется после перезапуска; уже выполненные этапы
+    берутся из контрольной точки.
+
+    В воркере под супервизором (supervised=True) каждый апдейт записывается
+    в журнал еще до доставки, поэтому остальные апдейты удаляются из журнала
+    после обработки.
+    """
+
+    def __init__(self, journal: UpdateJournal, supervised: bool = False) -> None:
+        self.journal = journal
+        self.supervised = supervised
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any]
+    ) -> Any:
+        if event.message is None or event.message.voice is None:
+            try:
+                return await handler(event, data)
+            finally:
+                if self.supervised:
+                    await self.journal.remove(event.update_id)
+
+        await self.journal.add(event)
+        try:
+            result = await handler(event, data)
+        except asyncio.CancelledError:
+            # Обработка прервана при остановке: апдейт остается в журнале
+            raise
+        except Exception:
+            await self.journal.remove(event.update_id)
+            raise
+        await self.journal.remove(event.update_id)
+        return result
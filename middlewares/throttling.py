@@ -0,0 +1,161 @@
+import asyncio
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict
+import redis.asyncio as redis
+from aiogram import BaseMiddleware
+from aiogram.types import Message
+from amplitude_dep import async_amplitude_track
+from config import settings
+
+
+# Атомарное скользящее окно на sorted set: удаляем старые отметки,
+# считаем оставшиеся и добавляем новую, только если лимит не превышен
+SLIDING_WINDOW_SCRIPT = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], 0, tonumber(ARGV[1]) - tonumber(ARGV[2]))
+if redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[3]) then
+    return 0
+end
+redis.call('ZADD', KEYS[1], ARGV[1], ARGV[4])
+redis.call('PEXPIRE', KEYS[1], ARGV[2])
+return 1
+"""
+
+THROTTLED_REPLY = "Слишком много сообщений подряд. Давай немного передохнём и продолжим через минуту 🙏"
+SHED_REPLY = "Сейчас у меня очень много собеседников. Пожалуйста, повтори через пару минут 🙏"
+
+# Тяжелые типы сообщений, которые запускают цепочку STT → Assistant → TTS или анализ фото
+EXPENSIVE_KINDS = {"voice", "photo"}
+
+
+def message_kind(message: Message) -> str:
+    if message.voice:
+        return "voice"
+    if message.photo:
+        return "photo"
+    if message.text:
+        return "text"
+    return "other"
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """
+    Ограничение частоты сообщений на пользователя и сброс нагрузки.
+
+    Лимиты считаются в Redis скользящим окном отдельно для каждого типа
+    сообщений, поэтому действуют во всех процессах бота. Если обработчиков
+    в работе слишком много или они стали слишком медленными, тяжелые
+    сообщения получают короткий ответ без запуска полной цепочки.
+
+    Счетчик обработчиков в работе используется и при остановке бота:
+    drain ждет, пока начатые обработчики завершатся.
+    """
+
+    def __init__(self, redis_connection: redis.Redis) -> None:
+        self.redis = redis_connection
+        self.sliding_window = redis_connection.register_script(SLIDING_WINDOW_SCRIPT)
+        self.limits: dict[str, tuple[int, int]] = {
+            "voice": (settings.THROTTLE_VOICE_LIMIT, settings.THROTTLE_WINDOW_SECONDS),
+            "photo": (settings.THROTTLE_PHOTO_LIMIT, settings.THROTTLE_WINDOW_SECONDS),
+            "text": (settings.THROTTLE_TEXT_LIMIT, settings.THROTTLE_WINDOW_SECONDS),
+        }
+        self.in_flight: int = 0
+        self.latency_ewma: float = 0.0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    def overloaded(self) -> bool:
+        if self.in_flight >= settings.SHED_MAX_IN_FLIGHT:
+            return True
+        # Высокая задержка учитывается только под нагрузкой, иначе старое значение
+        # держало бы бота в режиме сброса после того, как очередь рассосалась
+        return (
+            self.latency_ewma > settings.SHED_LATENCY_SECONDS
+            and self.in_flight >= settings.SHED_MAX_IN_FLIGHT // 2
+        )
+
+    async def allow(self, user_id: int, kind: str) -> bool:
+        limit, window = self.limits.get(kind, (0, 0))
+        if limit <= 0:
+            return True
+        now_ms = int(time.time() * 1000)
+        try:
+            allowed = await self.sliding_window(
+                keys=[f"throttle:{kind}:{user_id}"],
+                args=[now_ms, window * 1000, limit, f"{now_ms}:{uuid.uuid4().hex}"]
+            )
+            return bool(int(allowed))
+        except Exception as e:
+            # При недоступности Redis не блокируем пользователей
+            print(f"Ошибка при проверке лимита: {e}")
+            return True
+
+    async def should_notify(self, user_id: int, kind: str) -> bool:
+        """Предупреждаем о лимите один раз за окно, чтобы не отвечать на каждое сообщение спамера"""
+        _, window = self.limits[kind]
+        try:
+            return bool(await self.redis.set(f"throttle_notice:{kind}:{user_id}", 1, nx=True, ex=window))
+        except Exception:
+            return False
+
+    async def drain(self, timeout: float) -> bool:
+        """
+        Ждет завершения обработчиков в работе не дольше timeout секунд.
+
+        Возвращает:
+        - bool: True, если все обработчики завершились.
+        """
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def record_latency(self, seconds: float) -> None:
+        alpha = 0.2
+        self.latency_ewma = seconds if self.latency_ewma == 0 else (
+            alpha * seconds + (1 - alpha) * self.latency_ewma
+        )
+
+    async def __call__(
+        self,
+        handler: Callable[[Message, Dict[str, Any]], Awaitable[Any]],
+        event: Message,
+        data: Dict[str, Any]
+    ) -> Any:
+        if event.from_user is None:
+            return await handler(event, data)
+
+        user_id = event.from_user.id
+        kind = message_kind(event)
+
+        if kind in EXPENSIVE_KINDS and self.overloaded():
+            await async_amplitude_track(
+                user_id=user_id,
+                event_type="request_shed",
+                event_props={"kind": kind, "in_flight": self.in_flight}
+            )
+            await event.answer(SHED_REPLY)
+            return None
+
+        if not await self.allow(user_id, kind):
+            await async_amplitude_track(
+                user_id=user_id,
+                event_type="request_throttled",
+                event_props={"kind": kind}
+            )
+            if await self.should_notify(user_id, kind):
+                await event.answer(THROTTLED_REPLY)
+            return None
+
+        self.in_flight += 1
+        self._idle.clear()
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            self.in_flight -= 1
+            if self.in_flight == 0:
+                self._idle.set()
+            if kind in EXPENSIVE_KINDS:
+                self.record_latency(time.perf_counter() - started)
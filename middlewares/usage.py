@@ -0,0 +1,26 @@
+from typing import Any, Awaitable, Callable, Dict
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, User
+from services.usage_service import current_user_id
+
+
+class UsageContextMiddleware(BaseMiddleware):
+    """
+    Привязывает учет потребления к пользователю апдейта.
+
+    ID пользователя кладется в contextvar, поэтому сервисы в services/
+    получают его без изменения своих сигнатур.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        user: User | None = data.get("event_from_user")
+        token = current_user_id.set(user.id if user else None)
+        try:
+            return await handler(event, data)
+        finally:
+            current_user_id.reset(token)
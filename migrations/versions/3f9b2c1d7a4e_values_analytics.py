@@ -0,0 +1,83 @@
+"""Values analytics: normalized values and counters
+
+Revision ID: 3f9b2c1d7a4e
+Revises: 87c83e588026
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+import re
+from collections import Counter
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '3f9b2c1d7a4e'
+down_revision: Union[str, None] = '87c83e588026'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 1000
+
+# Копия services.values_analytics_service.normalize_value на момент миграции:
+# будущие изменения сервиса не должны менять результат этой ревизии
+_PUNCTUATION = re.compile(r"[^\w\s-]+")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_value(value: str) -> str:
+    value = value.lower().replace("ё", "е")
+    value = _PUNCTUATION.sub(" ", value)
+    return _SPACES.sub(" ", value).strip(" -")
+
+
+def upgrade() -> None:
+    op.add_column('values', sa.Column('normalized_value', sa.String(), nullable=True))
+    op.create_index(op.f('ix_values_normalized_value'), 'values', ['normalized_value'], unique=False)
+    op.create_table('value_counters',
+    sa.Column('normalized_value', sa.String(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('normalized_value')
+    )
+
+    # Заполняем нормализованные значения и счетчики для уже сохраненных ценностей
+    connection = op.get_bind()
+    values_table = sa.table('values', sa.column('id', sa.Integer), sa.column('value', sa.String),
+                            sa.column('normalized_value', sa.String))
+    counters_table = sa.table('value_counters', sa.column('normalized_value', sa.String),
+                              sa.column('count', sa.Integer))
+
+    update = (
+        values_table.update()
+        .where(values_table.c.id == sa.bindparam('row_id'))
+        .values(normalized_value=sa.bindparam('normalized'))
+    )
+
+    # Пачками по id: в памяти только одна пачка, UPDATE отправляется одним executemany
+    counts: Counter = Counter()
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            sa.select(values_table.c.id, values_table.c.value)
+            .where(values_table.c.id > last_id)
+            .order_by(values_table.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        batch = [{"row_id": row_id, "normalized": normalize_value(value)} for row_id, value in rows]
+        connection.execute(update, batch)
+        counts.update(item["normalized"] for item in batch)
+        last_id = rows[-1][0]
+    counts.pop("", None)
+    if counts:
+        op.bulk_insert(counters_table, [
+            {"normalized_value": value, "count": count} for value, count in counts.items()
+        ])
+
+
+def downgrade() -> None:
+    op.drop_table('value_counters')
+    op.drop_index(op.f('ix_values_normalized_value'), table_name='values')
+    op.drop_column('values', 'normalized_value')
@@ -0,0 +1,43 @@
+"""Usage accounting records
+
+Revision ID: 9c4e7b2a1f3d
+Revises: 3f9b2c1d7a4e
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '9c4e7b2a1f3d'
+down_revision: Union[str, None] = '3f9b2c1d7a4e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('usage_records',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('telegram_id', sa.BigInteger(), nullable=True),
+    sa.Column('stage', sa.String(), nullable=False),
+    sa.Column('model', sa.String(), nullable=False),
+    sa.Column('prompt_tokens', sa.Integer(), nullable=False),
+    sa.Column('completion_tokens', sa.Integer(), nullable=False),
+    sa.Column('audio_seconds', sa.Float(), nullable=False),
+    sa.Column('characters', sa.Integer(), nullable=False),
+    sa.Column('image_count', sa.Integer(), nullable=False),
+    sa.Column('wall_time_ms', sa.Integer(), nullable=False),
+    sa.Column('cost_usd', sa.Float(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_usage_records_stage'), 'usage_records', ['stage'], unique=False)
+    op.create_index(op.f('ix_usage_records_telegram_id'), 'usage_records', ['telegram_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_usage_records_telegram_id'), table_name='usage_records')
+    op.drop_index(op.f('ix_usage_records_stage'), table_name='usage_records')
+    op.drop_table('usage_records')
@@ -2,7 +2,8 @@ from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sess
 from config import settings
 
 
-engine = create_async_engine(settings.database_url, echo=True)
+# Эхо SQL пишет в лог синхронно из event loop, поэтому по умолчанию выключено
+engine = create_async_engine(settings.database_url, echo=settings.SQL_ECHO)
 
 
 async_session_maker = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
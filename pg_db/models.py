@@ -1,4 +1,5 @@
-from sqlalchemy import ForeignKey, String
+from datetime import datetime
+from sqlalchemy import BigInteger, DateTime, ForeignKey, String, func
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
 
@@ -20,5 +21,30 @@ class Value(Base):
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
     value: Mapped[str] = mapped_column(String, nullable=False)
+    normalized_value: Mapped[str | None] = mapped_column(String, nullable=True, index=True)
 
     user: Mapped["User"] = relationship(back_populates="values")
+
+
+class ValueCounter(Base):
+    __tablename__ = 'value_counters'
+
+    normalized_value: Mapped[str] = mapped_column(String, primary_key=True)
+    count: Mapped[int] = mapped_column(nullable=False, default=0)
+
+
+class UsageRecord(Base):
+    __tablename__ = 'usage_records'
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    telegram_id: Mapped[int | None] = mapped_column(BigInteger, nullable=True, index=True)
+    stage: Mapped[str] = mapped_column(String, nullable=False, index=True)
+    model: Mapped[str] = mapped_column(String, nullable=False)
+    prompt_tokens: Mapped[int] = mapped_column(nullable=False, default=0)
+    completion_tokens: Mapped[int] = mapped_column(nullable=False, default=0)
+    audio_seconds: Mapped[float] = mapped_column(nullable=False, default=0.0)
+    characters: Mapped[int] = mapped_column(nullable=False, default=0)
+    image_count: Mapped[int] = mapped_column(nullable=False, default=0)
+    wall_time_ms: Mapped[int] = mapped_column(nullable=False, default=0)
+    cost_usd: Mapped[float] = mapped_column(nullable=False, default=0.0)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
@@ -1,11 +1,17 @@
 import asyncio
 from pathlib import Path
 from typing import Optional
-import aiohttp
 from openai import AsyncOpenAI
 import openai
 from config import settings
+import services.assistant_client_state
 from services.assistant_client_state import client, assistant_id
+from services.citation_service import add_citations
+from services.startup_report import startup_report
+from services.usage_service import track_usage
+
+
+_provisioning_task: Optional[asyncio.Task] = None
 
 
 async def initialize_assistant(client: AsyncOpenAI, api_key: str, model: str = "gpt-4o", anxiety_file_path: str = None) -> str:
@@ -14,7 +20,7 @@ async def initialize_assistant(client: AsyncOpenAI, api_key: str, model: str = "
 
     Параметры:
     - client (AsyncOpenAI): Клиент OpenAI SDK.
-    - api_key (str): Ключ API OpenAI.
+    - api_key (str): Ключ API OpenAI (оставлен для совместимости, ключ берется из клиента).
     - model (str): Модель, например "gpt-4o".
     - anxiety_file_path (str): Путь к .docx файлу для загрузки в vector store.
 
@@ -23,81 +29,119 @@ async def initialize_assistant(client: AsyncOpenAI, api_key: str, model: str = "
     """
     from services.assistant_client_state import assistant_id
 
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "OpenAI-Beta": "assistants=v2",
-        "Content-Type": "application/json"
-    }
-
-    async with aiohttp.ClientSession() as session:
-        # 1. Создание или обновление ассистента
-        if assistant_id is None:
-            assistant = await client.beta.assistants.create(
-                name="Persistent Assistant",
-                instructions=(
-                    "Ты универсальный помощник. Отвечай на общие вопросы используя свои знания. "
-                    "Когда тебя спрашивают о тревожности, тревоге, панических атаках или "
-                    "связанных темах — используй информацию из прикрепленных материалов. "
-                    "При цитировании из файлов всегда указывай название файла."
-                ),
-                model=model,
-                tools=[{"type": "file_search"}]
-            )
-            assistant_id = assistant.id
-        else:
-            assistant = await client.beta.assistants.update(
-                assistant_id=assistant_id,
-                tools=[{"type": "file_search"}]
-            )
+    # Все запросы идут через SDK и общий пул соединений клиента (services/http_transport.py)
 
-        # 2. Создание vector store
-        vector_store_payload = {"name": "Anxiety Vector Store"}
-        async with session.post("https://api.openai.com/v1/vector_stores", headers=headers, json=vector_store_payload) as resp:
-            vector_store = await resp.json()
-            vector_store_id = vector_store["id"]
-
-        # 3. Загрузка файла
-        if anxiety_file_path:
-            file_path = Path(anxiety_file_path)
-            form_data = aiohttp.FormData()
-            form_data.add_field("purpose", "assistants")
-            form_data.add_field("file", file_path.open("rb"), filename=file_path.name)
-
-            file_headers = {
-                "Authorization": f"Bearer {api_key}"
-            }
+    # 1. Создание или обновление ассистента
+    if assistant_id is None:
+        assistant = await client.beta.assistants.create(
+            name="Persistent Assistant",
+            instructions=(
+                "Ты универсальный помощник. Отвечай на общие вопросы используя свои знания. "
+                "Когда тебя спрашивают о тревожности, тревоге, панических атаках или "
+                "связанных темах — используй информацию из прикрепленных материалов. "
+                "При цитировании из файлов всегда указывай название файла."
+            ),
+            model=model,
+            tools=[{"type": "file_search"}]
+        )
+        assistant_id = assistant.id
+    else:
+        assistant = await client.beta.assistants.update(
+            assistant_id=assistant_id,
+            tools=[{"type": "file_search"}]
+        )
+
+    # 2. Создание vector store
+    vector_store = await client.vector_stores.create(name="Anxiety Vector Store")
+    vector_store_id = vector_store.id
+
+    # 3. Загрузка файла
+    if anxiety_file_path:
+        file_data = await client.files.create(
+            file=Path(anxiety_file_path),
+            purpose="assistants"
+        )
 
-            async with session.post("https://api.openai.com/v1/files", headers=file_headers, data=form_data) as resp:
-                file_data = await resp.json()
-                file_id = file_data["id"]
-
-            # 4. Добавление файла в vector store
-            batch_payload = {"file_ids": [file_id]}
-            async with session.post(
-                f"https://api.openai.com/v1/vector_stores/{vector_store_id}/file_batches",
-                headers=headers,
-                json=batch_payload
-            ) as resp:
-                _ = await resp.json()
-
-        # 5. Привязка vector store к ассистенту
-        update_payload = {
-            "tool_resources": {
-                "file_search": {
-                    "vector_store_ids": [vector_store_id]
-                }
+        # 4. Добавление файла в vector store
+        await client.vector_stores.file_batches.create(
+            vector_store_id=vector_store_id,
+            file_ids=[file_data.id]
+        )
+
+    # 5. Привязка vector store к ассистенту
+    await client.beta.assistants.update(
+        assistant_id=assistant_id,
+        tool_resources={
+            "file_search": {
+                "vector_store_ids": [vector_store_id]
             }
         }
-        async with session.post(
-            f"https://api.openai.com/v1/assistants/{assistant_id}",
-            headers=headers,
-            json=update_payload
-        ) as resp:
-            _ = await resp.json()
+    )
 
+    services.assistant_client_state.assistant_id = assistant_id
     return assistant_id
 
 
+def start_assistant_provisioning() -> asyncio.Task:
+    """
+    Запускает инициализацию ассистента в фоне, если она еще не идет.
+
+    Повторный вызов возвращает ту же задачу; после неудачи запускается новая попытка.
+    """
+    global _provisioning_task
+
+    if _provisioning_task is None or (
+        _provisioning_task.done()
+        and (_provisioning_task.cancelled() or _provisioning_task.exception())
+    ):
+        _provisioning_task = asyncio.create_task(
+            initialize_assistant(
+                client,
+                settings.OPENAI_API_KEY,
+                model=settings.ASSISTANT_MODEL,
+                anxiety_file_path="anxiety.docx"
+            ),
+            name="assistant_provisioning"
+        )
+        _provisioning_task.add_done_callback(_report_provisioning)
+    return _provisioning_task
+
+
+def set_provisioning_source(source: asyncio.Future) -> None:
+    """
+    Подключает ворота готовности к внешнему источнику ID ассистента.
+
+    Используется воркерами supervisor.py: ассистента создает супервизор,
+    а воркеры только ждут его ID, не создавая собственных.
+    """
+    global _provisioning_task
+    _provisioning_task = source
+
+
+def _report_provisioning(task: asyncio.Task) -> None:
+    if task.cancelled():
+        return
+    if task.exception():
+        print(f"Ошибка при инициализации ассистента: {task.exception()}")
+    else:
+        startup_report.mark("assistant ready")
+        startup_report.print_report()
+
+
+async def wait_assistant_ready() -> str:
+    """
+    Ворота готовности: ждет окончания инициализации ассистента.
+
+    Обработчики вызывают ее только тогда, когда им действительно нужен ассистент.
+
+    Возвращает:
+    - str: ID ассистента.
+    """
+    if services.assistant_client_state.assistant_id is not None:
+        return services.assistant_client_state.assistant_id
+    return await asyncio.shield(start_assistant_provisioning())
+
+
 async def get_single_response(question: str, file_path: str = None, model: str = "gpt-4o") -> tuple[Optional[str], Optional[str]]:
     """
     Отправляет вопрос в OpenAI GPT-4o и получает ответ, возвращая также thread_id.
@@ -111,15 +155,7 @@ async def get_single_response(question: str, file_path: str = None, model: str =
     Возвращает:
     - tuple[Optional[str], Optional[str]]: (ответ, thread_id)
     """
-    from services.assistant_client_state import assistant_id
-    
-    if assistant_id is None:
-            assistant_id = await initialize_assistant(
-        client,
-        settings.OPENAI_API_KEY,
-        model="gpt-4o",
-        anxiety_file_path="anxiety.docx" 
-    )
+    assistant_id = await wait_assistant_ready()
             
     thread = await client.beta.threads.create()
     
@@ -128,13 +164,13 @@ async def get_single_response(question: str, file_path: str = None, model: str =
     try:
         # Загружаем файл, если путь указан
         if file_path:
-            with open(file_path, "rb") as file:
-                uploaded_file = await client.files.create(
-                    file=file,
-                    purpose="assistants"
-                )
-                uploaded_file_id = uploaded_file.id
-                print(f"Файл {file_path} загружен с ID: {uploaded_file_id}")
+            # SDK читает Path асинхронно, не блокируя event loop
+            uploaded_file = await client.files.create(
+                file=Path(file_path),
+                purpose="assistants"
+            )
+            uploaded_file_id = uploaded_file.id
+            print(f"Файл {file_path} загружен с ID: {uploaded_file_id}")
         
         # Создаем сообщение пользователя, прикрепляя файл при наличии
         message_params = {
@@ -150,10 +186,12 @@ async def get_single_response(question: str, file_path: str = None, model: str =
         await client.beta.threads.messages.create(**message_params)
         
         # Запускаем обработку
-        run = await client.beta.threads.runs.create_and_poll(
-            thread_id=thread.id,
-            assistant_id=assistant_id
-        )
+        async with track_usage("assistant", model) as usage:
+            run = await client.beta.threads.runs.create_and_poll(
+                thread_id=thread.id,
+                assistant_id=assistant_id
+            )
+            usage.add_tokens(run.usage)
         
         # Получаем ответ
         messages = await client.beta.threads.messages.list(thread_id=thread.id)
@@ -166,24 +204,7 @@ async def get_single_response(question: str, file_path: str = None, model: str =
                         answer = content.text.value
                         
                         if hasattr(content.text, 'annotations'):
-                            annotations = sorted(
-                                content.text.annotations,
-                                key=lambda x: x.start_index,
-                                reverse=True 
-                            )
-                            
-                            for annotation in annotations:
-                                if hasattr(annotation, 'file_citation'):
-                                    try:
-                                        file_id = annotation.file_citation.file_id
-                                        file_info = await client.files.retrieve(file_id)
-                                        file_name = file_info.filename
-                                        
-                                        end_pos = annotation.end_index
-                                        answer = answer[:end_pos] + f' (из файла: {file_name})' + answer[end_pos:]
-                                        
-                                    except Exception as e:
-                                        print(f"Ошибка при обработке аннотации: {e}")
+                            answer = await add_citations(client, answer, content.text.annotations)
                
                         break
                 if answer:
@@ -1,5 +1,9 @@
 from openai import AsyncOpenAI
 from config import settings
+from services.http_transport import openai_http_client
 
-client: AsyncOpenAI = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+client: AsyncOpenAI = AsyncOpenAI(
+    api_key=settings.OPENAI_API_KEY,
+    http_client=openai_http_client
+)
 assistant_id: str | None = None
\ No newline at end of file
@@ -0,0 +1,64 @@
+from io import BytesIO
+from typing import AsyncGenerator, AsyncIterator, Callable, Union
+from aiogram import Bot
+from aiogram.types.input_file import DEFAULT_CHUNK_SIZE, InputFile
+
+
+AudioData = Union[bytes, bytearray, memoryview, BytesIO]
+
+
+def audio_view(data: AudioData) -> memoryview:
+    """
+    Возвращает memoryview на аудиоданные без копирования.
+
+    BytesIO, созданный из bytes (как в text_to_audio), разделяет с ними
+    буфер: getvalue() возвращает исходный объект bytes, а getbuffer()
+    сначала копирует все данные. Для BytesIO, заполненного через write(),
+    наоборот, без копии обходится только getbuffer() — такой буфер нужно
+    передавать как data.getbuffer().
+    """
+    if isinstance(data, BytesIO):
+        return memoryview(data.getvalue())
+    return memoryview(data)
+
+
+class MemoryVoiceFile(InputFile):
+    """
+    Аудио из памяти для отправки в Telegram.
+
+    В отличие от BufferedInputFile не требует bytes: отдает куски
+    через memoryview, не копируя весь буфер перед загрузкой.
+    """
+
+    def __init__(self, data: AudioData, filename: str, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        super().__init__(filename=filename, chunk_size=chunk_size)
+        self.data = data
+
+    async def read(self, bot: Bot) -> AsyncGenerator[memoryview, None]:
+        view = audio_view(self.data)
+        for offset in range(0, len(view), self.chunk_size):
+            yield view[offset:offset + self.chunk_size]
+
+
+class StreamingVoiceFile(InputFile):
+    """
+    Аудио, которое передается в Telegram по мере получения от источника.
+
+    Источник (например, потоковый ответ TTS) открывается только во время
+    загрузки, поэтому полный файл никогда не хранится в памяти целиком.
+    """
+
+    def __init__(
+        self,
+        source: Callable[[int], AsyncIterator[bytes]],
+        filename: str,
+        chunk_size: int = DEFAULT_CHUNK_SIZE
+    ):
+        super().__init__(filename=filename, chunk_size=chunk_size)
+        self.source = source
+        self.bytes_sent: int = 0
+
+    async def read(self, bot: Bot) -> AsyncGenerator[bytes, None]:
+        async for chunk in self.source(self.chunk_size):
+            self.bytes_sent += len(chunk)
+            yield chunk
@@ -1,13 +1,67 @@
+import asyncio
 from io import BytesIO
 from typing import Optional
 from services.assistant_client_service import client
 from config import settings
+from services.ogg_opus import OGG_PREFIX_SIZE, OGG_TAIL_SIZE, is_ogg_opus_prefix, split_ogg_opus, stream_duration
+from services.transcript_stitching import stitch_transcripts
+from services.usage_service import track_usage
+
+
+# Общий на процесс лимит одновременных запросов к Whisper для фрагментов длинных записей
+stt_semaphore = asyncio.Semaphore(settings.STT_MAX_CONCURRENCY)
+
+
+async def _transcribe(audio_file: BytesIO) -> str:
+    # Отправляем аудиофайл в API Whisper; verbose_json возвращает и длительность аудио
+    async with track_usage("stt", "whisper-1") as usage:
+        transcription = await client.audio.transcriptions.create(
+            model="whisper-1",
+            file=audio_file,
+            response_format="verbose_json"
+        )
+        usage.audio_seconds = transcription.duration or 0.0
+    return transcription.text
+
+
+async def _transcribe_segment(segment: bytes, index: int) -> str:
+    audio_file = BytesIO(segment)
+    audio_file.name = f"segment{index}.ogg"
+    async with stt_semaphore:
+        return await _transcribe(audio_file)
+
+
+async def transcribe_long_audio(data: bytes) -> str:
+    """
+    Распознает длинную запись Ogg/Opus по частям.
+
+    Запись делится по паузам на перекрывающиеся фрагменты (в отдельном потоке,
+    чтобы не блокировать event loop), фрагменты распознаются параллельно
+    с ограничением stt_semaphore, тексты склеиваются без повторов на стыках.
+
+    Исключения:
+    - Пробрасывает ошибки разбора контейнера и обращения к API.
+    """
+    segments = await asyncio.to_thread(
+        split_ogg_opus,
+        data,
+        settings.STT_SEGMENT_SECONDS,
+        settings.STT_SEGMENT_OVERLAP_SECONDS
+    )
+    parts = await asyncio.gather(*(
+        _transcribe_segment(segment, index) for index, segment in enumerate(segments)
+    ))
+    return stitch_transcripts(list(parts))
 
 
 async def audio_to_text(audio_file: BytesIO) -> Optional[str]:
     """
     Преобразует аудиофайл в текст с использованием OpenAI Whisper API.
 
+    Записи Ogg/Opus длиннее STT_LONG_AUDIO_SECONDS распознаются по частям
+    параллельно (см. transcribe_long_audio); при ошибке такого режима запись
+    отправляется в Whisper целиком.
+
     Параметры:
     - audio_file (BytesIO): Файлоподобный объект с аудиофайлом (OGG, MP3, WAV и др.).
 
@@ -20,17 +74,23 @@ async def audio_to_text(audio_file: BytesIO) -> Optional[str]:
       или произошла ошибка при обращении к API.
     """
 
+    # Формат и длительность определяются по началу и концу буфера без копирования записи
+    with audio_file.getbuffer() as buffer:
+        prefix = bytes(buffer[:OGG_PREFIX_SIZE])
+        tail = bytes(buffer[-OGG_TAIL_SIZE:])
+    if is_ogg_opus_prefix(prefix):
+        try:
+            if stream_duration(prefix, tail) > settings.STT_LONG_AUDIO_SECONDS:
+                return await transcribe_long_audio(audio_file.getvalue())
+        except Exception as e:
+            print(f"Ошибка при распознавании аудио по частям: {e}")
+
     try:
         # Перематываем поток в начало (на всякий случай)
         audio_file.seek(0)
-        audio_file.name = "audio.ogg"  
+        audio_file.name = "audio.ogg"
 
-        # Отправляем аудиофайл в API Whisper
-        question: str = await client.audio.transcriptions.create(
-            model="whisper-1",
-            file=audio_file,
-            response_format="text"
-        )
+        question: str = await _transcribe(audio_file)
         return question
     except Exception as e:
         print(f"Ошибка при конвертации аудио в текст: {e}")
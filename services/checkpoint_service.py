@@ -0,0 +1,133 @@
+import json
+from typing import Any, Awaitable, Callable, Optional
+import redis.asyncio as redis
+from aiogram.types import Update
+from config import settings
+
+
+class StageCheckpoint:
+    """
+    Результаты завершенных этапов обработки одного апдейта.
+
+    Хранятся в Redis-хэше checkpoint:{update_id} в виде JSON, поэтому при
+    повторной обработке того же апдейта (после падения или перезапуска)
+    уже выполненные этапы не повторяются: не распознается заново голосовое,
+    не запускается ассистент и не отправляется второй ответ. Ошибки Redis
+    только логируются — без контрольных точек обработка идет как обычно.
+    """
+
+    def __init__(self, redis_connection: redis.Redis, update_id: int) -> None:
+        self.redis = redis_connection
+        self.key = f"checkpoint:{update_id}"
+        self._stored: Optional[dict[str, Any]] = None
+
+    async def load(self) -> dict[str, Any]:
+        """Все сохраненные результаты этапов по имени; Redis читается один раз"""
+        if self._stored is None:
+            try:
+                stored = await self.redis.hgetall(self.key)
+                self._stored = {stage: json.loads(value) for stage, value in stored.items()}
+            except Exception as e:
+                print(f"Ошибка при чтении контрольных точек: {e}")
+                self._stored = {}
+        return self._stored
+
+    async def save(self, stage: str, value: Any) -> None:
+        (await self.load())[stage] = value
+        try:
+            await self.redis.hset(self.key, stage, json.dumps(value, ensure_ascii=False))
+            await self.redis.expire(self.key, settings.CHECKPOINT_TTL)
+        except Exception as e:
+            print(f"Ошибка при сохранении контрольной точки {stage}: {e}")
+
+    async def cached(self, stage: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Возвращает сохраненный результат этапа или выполняет этап и сохраняет результат.
+
+        None считается неудачей и не сохраняется, чтобы повтор выполнил этап заново.
+        """
+        stored = await self.load()
+        if stage in stored:
+            return stored[stage]
+        value = await compute()
+        if value is not None:
+            await self.save(stage, value)
+        return value
+
+
+class CheckpointStore:
+    """Фабрика контрольных точек; передается в обработчики через данные диспетчера"""
+
+    def __init__(self, redis_connection: redis.Redis) -> None:
+        self.redis = redis_connection
+
+    def for_update(self, update: Update) -> StageCheckpoint:
+        return StageCheckpoint(self.redis, update.update_id)
+
+
+class UpdateJournal:
+    """
+    Журнал апдейтов, обработка которых началась, но не закончилась.
+
+    Апдейт записывается перед обработкой и удаляется после нее. Если процесс
+    упал или был остановлен до завершения обработчика, апдейт остается
+    в журнале и повторяется при следующем запуске, продолжая работу
+    с последней контрольной точки. Количество повторов ограничено, чтобы
+    апдейт, который роняет процесс, не повторялся бесконечно.
+    """
+
+    def __init__(self, redis_connection: redis.Redis, name: str) -> None:
+        self.redis = redis_connection
+        self.key = f"update_journal:{name}"
+        self.attempts_key = f"update_journal:{name}:attempts"
+
+    async def add(self, update: Update) -> None:
+        payload = update.model_dump_json(exclude_none=True, by_alias=True)
+        try:
+            await self.redis.hset(self.key, str(update.update_id), payload)
+        except Exception as e:
+            print(f"Ошибка при записи апдейта в журнал: {e}")
+
+    async def add_many(self, updates: list[dict]) -> None:
+        """
+        Записывает пачку апдейтов в исходном виде Telegram одним запросом.
+
+        Супервизор вызывает его до отправки апдейтов в очередь воркера, поэтому
+        апдейты, которые воркер не успел забрать, повторяются после его перезапуска.
+        """
+        if not updates:
+            return
+        try:
+            await self.redis.hset(self.key, mapping={
+                str(update["update_id"]): json.dumps(update, ensure_ascii=False) for update in updates
+            })
+        except Exception as e:
+            print(f"Ошибка при записи апдейтов в журнал: {e}")
+
+    async def remove(self, update_id: int) -> None:
+        try:
+            await self.redis.hdel(self.key, str(update_id))
+            await self.redis.hdel(self.attempts_key, str(update_id))
+        except Exception as e:
+            print(f"Ошибка при удалении апдейта из журнала: {e}")
+
+    async def pending(self) -> list[dict]:
+        """
+        Незавершенные апдейты для повторной обработки.
+
+        Апдейты, исчерпавшие CHECKPOINT_MAX_REPLAYS повторов, удаляются из журнала.
+        """
+        updates = []
+        try:
+            stored = await self.redis.hgetall(self.key)
+            for update_id, payload in sorted(stored.items(), key=lambda item: int(item[0])):
+                attempts = await self.redis.hincrby(self.attempts_key, update_id, 1)
+                if attempts > settings.CHECKPOINT_MAX_REPLAYS:
+                    print(f"Апдейт {update_id} не обработан за {settings.CHECKPOINT_MAX_REPLAYS} повтора, пропускаем")
+                    await self.remove(int(update_id))
+                    continue
+                updates.append(json.loads(payload))
+        except Exception as e:
+            print(f"Ошибка при чтении журнала апдейтов: {e}")
+        return updates
+
@@ -0,0 +1,74 @@
+import asyncio
+from typing import Iterable
+from openai import AsyncOpenAI
+
+
+# Кэш на весь процесс: ID файла в OpenAI -> имя файла
+file_names: dict[str, str] = {}
+
+
+async def resolve_file_names(client: AsyncOpenAI, file_ids: Iterable[str]) -> dict[str, str]:
+    """
+    Возвращает имена файлов по их ID, запрашивая у API только неизвестные.
+
+    Неизвестные ID запрашиваются параллельно, результат сохраняется в кэше,
+    поэтому для уже встречавшихся файлов запросов к API нет.
+
+    Параметры:
+    - client (AsyncOpenAI): Клиент OpenAI SDK.
+    - file_ids (Iterable[str]): ID файлов из аннотаций.
+
+    Возвращает:
+    - dict[str, str]: Имена найденных файлов по ID.
+    """
+    file_ids = set(file_ids)
+    unknown = [file_id for file_id in file_ids if file_id not in file_names]
+
+    if unknown:
+        results = await asyncio.gather(
+            *(client.files.retrieve(file_id) for file_id in unknown),
+            return_exceptions=True
+        )
+        for file_id, result in zip(unknown, results):
+            if isinstance(result, Exception):
+                print(f"Ошибка при обработке аннотации: {result}")
+            else:
+                file_names[file_id] = result.filename
+
+    return {file_id: file_names[file_id] for file_id in file_ids if file_id in file_names}
+
+
+async def add_citations(client: AsyncOpenAI, text: str, annotations: list) -> str:
+    """
+    Добавляет в ответ ассистента названия файлов после каждой цитаты.
+
+    Строка собирается за один проход вместо вставки по срезам на каждую аннотацию.
+
+    Параметры:
+    - client (AsyncOpenAI): Клиент OpenAI SDK.
+    - text (str): Текст ответа ассистента.
+    - annotations (list): Аннотации из content.text.annotations.
+
+    Возвращает:
+    - str: Текст с указанием файлов-источников.
+    """
+    citations = [annotation for annotation in annotations if hasattr(annotation, "file_citation")]
+    if not citations:
+        return text
+
+    names = await resolve_file_names(
+        client, (annotation.file_citation.file_id for annotation in citations)
+    )
+
+    parts: list[str] = []
+    position = 0
+    for annotation in sorted(citations, key=lambda x: x.end_index):
+        file_name = names.get(annotation.file_citation.file_id)
+        if file_name is None:
+            continue
+        parts.append(text[position:annotation.end_index])
+        parts.append(f" (из файла: {file_name})")
+        position = annotation.end_index
+    parts.append(text[position:])
+
+    return "".join(parts)
@@ -0,0 +1,255 @@
+import json
+import os
+from dataclasses import dataclass
+from typing import Optional
+import numpy as np
+
+
+FORMAT_VERSION = 1
+# Сколько строк матрицы обрабатывается за раз при полном переборе
+SEARCH_BLOCK_ROWS = 65536
+
+
+@dataclass
+class SearchResult:
+    id: str
+    score: float
+    document: str
+    metadata: dict
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def quantize(vectors: np.ndarray, dtype: str) -> tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Квантует нормированные векторы.
+
+    Возвращает:
+    - tuple: (матрица в dtype, масштабы строк для int8 или None для float16).
+    """
+    if dtype == "float16":
+        return vectors.astype(np.float16), None
+    if dtype == "int8":
+        scales = np.abs(vectors).max(axis=1) / 127
+        scales = np.maximum(scales, 1e-12).astype(np.float32)
+        quantized = np.round(vectors / scales[:, None]).astype(np.int8)
+        return quantized, scales
+    raise ValueError(f"Неподдерживаемый тип векторов: {dtype}")
+
+
+def kmeans(vectors: np.ndarray, n_lists: int, iterations: int = 20, seed: int = 0) -> tuple[np.ndarray, np.ndarray]:
+    """Сферический k-means для разбиения на списки IVF; возвращает (центроиды, номер списка строки)"""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), n_lists, replace=False)].copy()
+    assignment = np.zeros(len(vectors), dtype=np.int64)
+    for _ in range(iterations):
+        assignment = np.argmax(vectors @ centroids.T, axis=1)
+        for index in range(n_lists):
+            members = vectors[assignment == index]
+            if len(members):
+                centroids[index] = members.sum(axis=0)
+        centroids = _normalize(centroids)
+    return centroids, assignment
+
+
+def write_index(
+    output_directory: str,
+    vectors: np.ndarray,
+    ids: list[str],
+    documents: list[str],
+    metadatas: list[Optional[dict]],
+    dtype: str = "int8",
+    n_lists: int = 0
+) -> None:
+    """
+    Записывает индекс в каталог.
+
+    Состав каталога:
+    - vectors.npy: матрица (n, dim) float16 или int8, строки упорядочены по спискам IVF.
+    - scales.npy: масштаб каждой строки для int8.
+    - centroids.npy, offsets.npy: центроиды и границы списков IVF, если они есть.
+    - meta.json: формат, ids, тексты чанков и метаданные в порядке строк.
+
+    Параметры:
+    - vectors (np.ndarray): Исходные векторы (n, dim), нормируются при записи.
+    - dtype (str): "float16" или "int8".
+    - n_lists (int): Количество списков IVF; 0 — только полный перебор.
+    """
+    vectors = _normalize(vectors)
+    order = np.arange(len(vectors))
+    centroids = offsets = None
+    if n_lists > 0:
+        n_lists = min(n_lists, len(vectors))
+        centroids, assignment = kmeans(vectors, n_lists)
+        order = np.argsort(assignment, kind="stable")
+        offsets = np.searchsorted(assignment[order], np.arange(n_lists + 1)).astype(np.int64)
+        vectors = vectors[order]
+
+    quantized, scales = quantize(vectors, dtype)
+    os.makedirs(output_directory, exist_ok=True)
+    np.save(os.path.join(output_directory, "vectors.npy"), quantized)
+    if scales is not None:
+        np.save(os.path.join(output_directory, "scales.npy"), scales)
+    if centroids is not None:
+        np.save(os.path.join(output_directory, "centroids.npy"), centroids)
+        np.save(os.path.join(output_directory, "offsets.npy"), offsets)
+
+    meta = {
+        "version": FORMAT_VERSION,
+        "dtype": dtype,
+        "dimensions": int(vectors.shape[1]),
+        "count": int(vectors.shape[0]),
+        "n_lists": int(n_lists),
+        "ids": [ids[i] for i in order],
+        "documents": [documents[i] for i in order],
+        "metadatas": [metadatas[i] or {} for i in order],
+    }
+    with open(os.path.join(output_directory, "meta.json"), "w", encoding="utf-8") as file:
+        json.dump(meta, file, ensure_ascii=False)
+
+
+def export_chroma(
+    persist_directory: str,
+    output_directory: str,
+    collection_name: str = "langchain",
+    dtype: str = "int8",
+    n_lists: int = 0
+) -> int:
+    """
+    Выгружает коллекцию Chroma в компактный индекс.
+
+    Возвращает:
+    - int: Количество выгруженных векторов.
+    """
+    # chromadb нужен только для экспорта, воркерам достаточно numpy
+    import chromadb
+
+    collection = chromadb.PersistentClient(path=persist_directory).get_collection(collection_name)
+    data = collection.get(include=["embeddings", "documents", "metadatas"])
+    write_index(
+        output_directory,
+        np.asarray(data["embeddings"], dtype=np.float32),
+        list(data["ids"]),
+        list(data["documents"]),
+        list(data["metadatas"]),
+        dtype=dtype,
+        n_lists=n_lists
+    )
+    return len(data["ids"])
+
+
+class CompactIndex:
+    """
+    Квантованный индекс эмбеддингов, открытый через mmap.
+
+    Матрица векторов не читается в память процесса: страницы файла живут
+    в page cache и общие для всех воркеров, поэтому открытие почти мгновенно,
+    а память процесса не растет с размером индекса. Поиск по косинусной
+    близости: полный перебор блоками или IVF с просмотром nprobe ближайших списков.
+
+    Экспорт из Chroma:
+        python -m services.compact_index export docx_vector_db compact_index --dtype int8
+    """
+
+    def __init__(self, directory: str) -> None:
+        with open(os.path.join(directory, "meta.json"), encoding="utf-8") as file:
+            meta = json.load(file)
+        if meta["version"] != FORMAT_VERSION:
+            raise ValueError(f"Неподдерживаемая версия индекса: {meta['version']}")
+        self.dtype: str = meta["dtype"]
+        self.dimensions: int = meta["dimensions"]
+        self.ids: list[str] = meta["ids"]
+        self.documents: list[str] = meta["documents"]
+        self.metadatas: list[dict] = meta["metadatas"]
+
+        self.vectors = np.load(os.path.join(directory, "vectors.npy"), mmap_mode="r")
+        self.scales = None
+        if self.dtype == "int8":
+            self.scales = np.load(os.path.join(directory, "scales.npy"), mmap_mode="r")
+        self.centroids = self.offsets = None
+        if meta["n_lists"]:
+            self.centroids = np.load(os.path.join(directory, "centroids.npy"))
+            self.offsets = np.load(os.path.join(directory, "offsets.npy"))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _scores(self, query: np.ndarray, start: int, end: int) -> np.ndarray:
+        scores = np.empty(end - start, dtype=np.float32)
+        for block in range(start, end, SEARCH_BLOCK_ROWS):
+            block_end = min(block + SEARCH_BLOCK_ROWS, end)
+            rows = self.vectors[block:block_end].astype(np.float32)
+            block_scores = rows @ query
+            if self.scales is not None:
+                block_scores *= self.scales[block:block_end]
+            scores[block - start:block_end - start] = block_scores
+        return scores
+
+    def search_vector(self, vector, k: int = 4, nprobe: Optional[int] = None) -> list[SearchResult]:
+        """
+        Ищет k ближайших чанков к вектору запроса.
+
+        Параметры:
+        - vector: Эмбеддинг запроса той же модели, что и при построении.
+        - k (int): Количество результатов.
+        - nprobe (Optional[int]): Сколько списков IVF просматривать; None — полный перебор.
+        """
+        query = _normalize(vector).reshape(-1)
+        if self.centroids is not None and nprobe is not None:
+            lists = np.argsort(-(self.centroids @ query))[:max(nprobe, 1)]
+            ranges = [(int(self.offsets[i]), int(self.offsets[i + 1])) for i in lists]
+        else:
+            ranges = [(0, len(self))]
+
+        rows = np.concatenate([np.arange(start, end) for start, end in ranges])
+        scores = np.concatenate([self._scores(query, start, end) for start, end in ranges])
+        k = min(k, len(rows))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            SearchResult(
+                id=self.ids[rows[i]],
+                score=float(scores[i]),
+                document=self.documents[rows[i]],
+                metadata=self.metadatas[rows[i]],
+            )
+            for i in top
+        ]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Компактный индекс эмбеддингов")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export = subparsers.add_parser("export", help="Выгрузить коллекцию Chroma")
+    export.add_argument("source", help="Каталог Chroma, например docx_vector_db")
+    export.add_argument("output", help="Каталог компактного индекса")
+    export.add_argument("--collection", default="langchain")
+    export.add_argument("--dtype", choices=("float16", "int8"), default="int8")
+    export.add_argument("--lists", type=int, default=0, help="Количество списков IVF")
+
+    search = subparsers.add_parser("search", help="Найти чанки по тексту запроса")
+    search.add_argument("index", help="Каталог компактного индекса")
+    search.add_argument("query")
+    search.add_argument("--k", type=int, default=4)
+    search.add_argument("--nprobe", type=int)
+
+    args = parser.parse_args()
+    if args.command == "export":
+        count = export_chroma(args.source, args.output, args.collection, args.dtype, args.lists)
+        print(f"Exported {count} vectors to {args.output}")
+    else:
+        from config import settings
+        from vector_store_service import openai_embeddings
+
+        vector = openai_embeddings(settings.OPENAI_API_KEY).embed_query(args.query)
+        for result in CompactIndex(args.index).search_vector(vector, args.k, args.nprobe):
+            print(f"{result.score:.4f}  {result.document[:120]!r}")
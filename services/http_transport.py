@@ -0,0 +1,109 @@
+import asyncio
+import importlib.util
+import httpx
+from aiogram.client.session.aiohttp import AiohttpSession
+from openai import DefaultAsyncHttpxClient
+from amplitude_dep import async_amplitude_track
+from config import settings
+
+
+# HTTP/2 для httpx требует пакет h2; без него остаемся на HTTP/1.1 с keep-alive
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+def create_openai_http_client() -> httpx.AsyncClient:
+    """
+    Создает общий HTTP-клиент для всех запросов к OpenAI.
+
+    Пул keep-alive соединений переиспользуется между сообщениями, поэтому
+    TLS-рукопожатие выполняется только при открытии нового соединения.
+    """
+    limits = httpx.Limits(
+        max_connections=settings.HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY
+    )
+    http2 = settings.HTTP2_ENABLED and HTTP2_AVAILABLE
+    transport = httpx.AsyncHTTPTransport(http2=http2, limits=limits, retries=1)
+    return DefaultAsyncHttpxClient(
+        transport=transport,
+        timeout=httpx.Timeout(
+            settings.HTTP_READ_TIMEOUT,
+            connect=settings.HTTP_CONNECT_TIMEOUT
+        )
+    )
+
+
+class PooledAiohttpSession(AiohttpSession):
+    """
+    Сессия aiogram с настроенным пулом соединений к api.telegram.org.
+
+    aiohttp не поддерживает HTTP/2, поэтому выигрыш достигается за счет
+    keep-alive, лимита соединений на хост и кэша DNS.
+    """
+
+    def __init__(self, **kwargs) -> None:
+        super().__init__(
+            limit=settings.HTTP_MAX_CONNECTIONS,
+            timeout=settings.HTTP_READ_TIMEOUT,
+            **kwargs
+        )
+        self._connector_init.update(
+            limit_per_host=settings.HTTP_MAX_CONNECTIONS_PER_HOST,
+            keepalive_timeout=settings.HTTP_KEEPALIVE_EXPIRY,
+            ttl_dns_cache=settings.HTTP_DNS_CACHE_TTL
+        )
+
+
+def create_telegram_session() -> PooledAiohttpSession:
+    return PooledAiohttpSession()
+
+
+openai_http_client: httpx.AsyncClient = create_openai_http_client()
+
+
+def openai_pool_metrics() -> dict[str, int]:
+    """Состояние пула соединений к OpenAI"""
+    pool = getattr(openai_http_client._transport, "_pool", None)
+    connections = list(getattr(pool, "connections", []))
+    return {
+        "openai_connections": len(connections),
+        "openai_idle": sum(1 for connection in connections if connection.is_idle()),
+        "openai_http2": sum(
+            1 for connection in connections
+            if "HTTP/2" in getattr(connection, "info", lambda: "")()
+        ),
+    }
+
+
+def telegram_pool_metrics(session: AiohttpSession) -> dict[str, int]:
+    """Состояние пула соединений aiogram к Telegram Bot API"""
+    client_session = getattr(session, "_session", None)
+    connector = getattr(client_session, "connector", None)
+    if connector is None or connector.closed:
+        return {"telegram_connections": 0, "telegram_idle": 0}
+    idle = sum(len(connections) for connections in getattr(connector, "_conns", {}).values())
+    acquired = len(getattr(connector, "_acquired", ()))
+    return {"telegram_connections": idle + acquired, "telegram_idle": idle}
+
+
+def pool_metrics(session: AiohttpSession) -> dict[str, int]:
+    return {**openai_pool_metrics(), **telegram_pool_metrics(session)}
+
+
+def format_pool_metrics(session: AiohttpSession) -> str:
+    return "HTTP pools: " + ", ".join(f"{key}={value}" for key, value in pool_metrics(session).items())
+
+
+async def report_pool_metrics(session: AiohttpSession, interval: float) -> None:
+    """Периодически отправляет метрики пулов соединений в Amplitude событием http_pool_metrics"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await async_amplitude_track(
+                user_id="system",
+                event_type="http_pool_metrics",
+                event_props=pool_metrics(session)
+            )
+        except Exception as e:
+            print(f"Ошибка при отправке метрик пулов: {e}")
@@ -0,0 +1,160 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from typing import Optional
+from config import settings
+
+
+class LoopWatchdog:
+    """
+    Детектор блокировок event loop.
+
+    Внутри loop каждые interval секунд выполняется callback-пульс и замеряет
+    задержку своего запуска. Отдельный поток следит за пульсом: если loop
+    не отвечает дольше threshold, поток снимает стек потока loop — это стек
+    кода, который сейчас блокирует всех пользователей.
+    """
+
+    def __init__(self, threshold: float, interval: float = 0.1) -> None:
+        self.threshold = threshold
+        self.interval = interval
+        self.enabled = False
+        self.max_lag: float = 0.0
+        self.last_lag: float = 0.0
+        self.stalls: int = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._last_beat: float = 0.0
+        self._beat_handle: Optional[asyncio.TimerHandle] = None
+        # Номер включения: поток от предыдущего включения видит, что номер сменился, и завершается сам
+        self._generation: int = 0
+
+    def start(self, loop: Optional[asyncio.AbstractEventLoop] = None) -> None:
+        if self.enabled:
+            return
+        self._loop = loop or asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self.enabled = True
+        self._generation += 1
+        self._beat_handle = self._loop.call_later(self.interval, self._beat, time.monotonic() + self.interval)
+        thread = threading.Thread(target=self._watch, args=(self._generation,), name="loop-watchdog", daemon=True)
+        thread.start()
+
+    def stop(self) -> None:
+        self.enabled = False
+        self._generation += 1
+        if self._beat_handle is not None:
+            self._beat_handle.cancel()
+            self._beat_handle = None
+
+    def _beat(self, expected: float) -> None:
+        now = time.monotonic()
+        self._last_beat = now
+        self.last_lag = max(now - expected, 0.0)
+        self.max_lag = max(self.max_lag, self.last_lag)
+        if self.enabled:
+            self._beat_handle = self._loop.call_later(self.interval, self._beat, now + self.interval)
+
+    def _watch(self, generation: int) -> None:
+        reported_beat = None
+        while self._generation == generation:
+            time.sleep(self.interval)
+            if self._generation != generation:
+                break
+            stalled_for = time.monotonic() - self._last_beat
+            if stalled_for < self.threshold or reported_beat == self._last_beat:
+                continue
+            # Один отчет на одну блокировку
+            reported_beat = self._last_beat
+            self.stalls += 1
+            self._report(stalled_for)
+
+    def _report(self, stalled_for: float) -> None:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return
+        task = asyncio.current_task(self._loop)
+        task_name = task.get_name() if task else "-"
+        stack = "".join(traceback.format_stack(frame))
+        print(f"Event loop заблокирован на {stalled_for * 1000:.0f} мс (задача {task_name}):\n{stack}")
+
+    def status(self) -> str:
+        state = "включен" if self.enabled else "выключен"
+        return (
+            f"Watchdog {state}, порог {self.threshold * 1000:.0f} мс\n"
+            f"Последняя задержка: {self.last_lag * 1000:.1f} мс\n"
+            f"Максимальная задержка: {self.max_lag * 1000:.1f} мс\n"
+            f"Блокировок: {self.stalls}"
+        )
+
+
+class SamplingProfiler:
+    """
+    Семплирующий профайлер потока event loop.
+
+    Снимает стек потока loop с заданной частотой и пишет результат
+    в формате folded stacks ("a;b;c N"), который принимают flamegraph.pl,
+    speedscope и inferno.
+    """
+
+    def __init__(self, output_dir: str, interval: float = 0.005) -> None:
+        self.output_dir = output_dir
+        self.interval = interval
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _folded(frame) -> str:
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+    def _sample(self, thread_id: int, seconds: float) -> Counter:
+        samples: Counter = Counter()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            frame = sys._current_frames().get(thread_id)
+            if frame is not None:
+                samples[self._folded(frame)] += 1
+            time.sleep(self.interval)
+        return samples
+
+    async def profile(self, seconds: float) -> str:
+        """
+        Профилирует поток текущего event loop в течение seconds секунд.
+
+        Возвращает:
+        - str: Путь к файлу со свернутыми стеками.
+
+        Исключения:
+        - RuntimeError: Если профилирование уже выполняется.
+        """
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError("Профилирование уже выполняется")
+        try:
+            thread_id = threading.get_ident()
+            samples = await asyncio.to_thread(self._sample, thread_id, seconds)
+        finally:
+            self._lock.release()
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = os.path.join(self.output_dir, f"profile-{os.getpid()}-{int(time.time())}.folded")
+        lines = "".join(f"{stack} {count}\n" for stack, count in samples.most_common())
+        await asyncio.to_thread(self._write, path, lines)
+        return path
+
+    @staticmethod
+    def _write(path: str, content: str) -> None:
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(content)
+
+
+loop_watchdog = LoopWatchdog(threshold=settings.LOOP_LAG_THRESHOLD)
+sampling_profiler = SamplingProfiler(output_dir=settings.PROFILE_OUTPUT_DIR)
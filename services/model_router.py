@@ -0,0 +1,191 @@
+import math
+import random
+import re
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Optional
+from amplitude_dep import async_amplitude_track
+from config import settings
+from services.assistant_client_service import get_single_response
+from services.assistant_client_state import client
+from services.usage_service import current_user_id, track_usage
+
+
+LIGHT_INSTRUCTIONS = (
+    "Ты универсальный помощник. Отвечай на вопросы коротко и дружелюбно, "
+    "используя свои знания. Ответ будет озвучен, поэтому не используй списки и разметку."
+)
+
+# Основы слов, указывающих на тему тревожности (совпадение по началу слова)
+ANXIETY_STEMS = (
+    "тревог", "тревож", "паник", "паническ", "страх", "страш", "боюсь", "беспоко",
+    "волну", "стресс", "нервн", "фоби", "бессонниц", "сердцебиен", "успоко",
+    "депресс", "апати", "выгоран", "навязчив", "ужас", "переживан", "переживаю",
+    "anxiety", "panic",
+)
+# Фразы сопоставляются целыми словами (регулярные выражения), допустимые окончания
+# перечислены явно: "пока" не должно находиться в "покажи", "совет" — в "советский"
+HELP_PHRASES = (
+    "что делать", "как справиться", "как перестать", "как избавиться", "как успокоиться",
+    "помоги(?:те)?", "посоветуй(?:те)?", "совет(?:а|ы|у|ом|ов|ами)?", "почему я",
+)
+FEELING_PHRASES = ("я чувствую", "мне плохо", "мне тяжело", "не могу уснуть", "не могу спать")
+SMALL_TALK_PHRASES = (
+    r"привет\w*", "здравствуй(?:те)?", "как дела", "спасибо", "пока", "кто ты", r"шутк\w*",
+    r"анекдот\w*", "погод(?:а|ы|е|у|ой)", "как тебя зовут",
+)
+
+# Веса логистической модели: смещение и коэффициенты признаков
+WEIGHTS = {
+    "bias": -2.0,
+    "anxiety_hits": 3.0,
+    "help_seeking": 1.2,
+    "feelings": 1.8,
+    "small_talk": -1.5,
+    "log_words": 0.3,
+}
+
+_WORDS = re.compile(r"\w+")
+
+
+def _phrases_pattern(phrases: tuple[str, ...]) -> re.Pattern:
+    return re.compile(r"\b(?:" + "|".join(phrases) + r")\b")
+
+
+_HELP = _phrases_pattern(HELP_PHRASES)
+_FEELINGS = _phrases_pattern(FEELING_PHRASES)
+_SMALL_TALK = _phrases_pattern(SMALL_TALK_PHRASES)
+
+
+def extract_features(question: str) -> dict[str, float]:
+    """Дешевые локальные признаки вопроса для маршрутизации"""
+    text = question.lower().replace("ё", "е")
+    words = _WORDS.findall(text)
+    anxiety_hits = sum(1 for word in words if word.startswith(ANXIETY_STEMS))
+    return {
+        "anxiety_hits": float(min(anxiety_hits, 2)),
+        "help_seeking": float(_HELP.search(text) is not None),
+        "feelings": float(_FEELINGS.search(text) is not None),
+        "small_talk": float(_SMALL_TALK.search(text) is not None),
+        "log_words": math.log1p(len(words)),
+    }
+
+
+def rag_probability(question: str) -> float:
+    """
+    Вероятность того, что вопросу нужна полная цепочка с поиском по материалам.
+
+    Небольшой логистический классификатор поверх extract_features.
+    """
+    features = extract_features(question)
+    logit = WEIGHTS["bias"] + sum(WEIGHTS[name] * value for name, value in features.items())
+    return 1 / (1 + math.exp(-logit))
+
+
+def choose_route(question: str) -> tuple[str, float]:
+    """
+    Возвращает маршрут ("rag" или "light") и оценку классификатора.
+    """
+    score = rag_probability(question)
+    if not settings.ROUTER_ENABLED or score >= settings.ROUTER_RAG_THRESHOLD:
+        return "rag", score
+    return "light", score
+
+
+@dataclass
+class RouteStats:
+    count: int = 0
+    failures: int = 0
+    total_latency: float = 0.0
+    max_latency: float = 0.0
+
+    def add(self, latency: float, failed: bool) -> None:
+        self.count += 1
+        self.failures += failed
+        self.total_latency += latency
+        self.max_latency = max(self.max_latency, latency)
+
+
+route_stats: dict[str, RouteStats] = defaultdict(RouteStats)
+
+
+def format_route_stats() -> str:
+    lines = [f"Маршрутизация (порог {settings.ROUTER_RAG_THRESHOLD}):"]
+    for route, stats in sorted(route_stats.items()):
+        average = stats.total_latency / stats.count if stats.count else 0.0
+        lines.append(
+            f"{route}: {stats.count} запросов, ошибок {stats.failures}, "
+            f"среднее {average:.2f} с, максимум {stats.max_latency:.2f} с"
+        )
+    return "\n".join(lines)
+
+
+async def get_light_response(question: str) -> Optional[str]:
+    """
+    Отвечает на простой вопрос легкой моделью без поиска по файлам.
+
+    Возвращает:
+    - Optional[str]: Ответ или None при ошибке.
+    """
+    model = settings.ASSISTANT_LIGHT_MODEL
+    try:
+        async with track_usage("assistant_light", model) as usage:
+            response = await client.chat.completions.create(
+                model=model,
+                messages=[
+                    {"role": "system", "content": LIGHT_INSTRUCTIONS},
+                    {"role": "user", "content": question},
+                ],
+                temperature=0.7,
+                max_tokens=settings.ROUTER_LIGHT_MAX_TOKENS,
+            )
+            usage.add_tokens(response.usage)
+        return response.choices[0].message.content
+    except Exception as e:
+        print(f"Ошибка при получении ответа легкой модели: {e}")
+        return None
+
+
+async def answer_question(question: str) -> tuple[Optional[str], Optional[str]]:
+    """
+    Отвечает на вопрос по подходящему маршруту.
+
+    Вопросы о тревожности идут в ассистента с file_search, остальные — в легкую
+    модель. Если легкая модель не ответила, вопрос уходит в полную цепочку.
+
+    Возвращает:
+    - tuple[Optional[str], Optional[str]]: (ответ, thread_id); для легкого маршрута thread_id = None.
+    """
+    route, score = choose_route(question)
+    started = time.perf_counter()
+
+    thread_id = None
+    if route == "light":
+        answer = await get_light_response(question)
+        if answer is None:
+            route_stats[route].add(time.perf_counter() - started, failed=True)
+            route = "rag_fallback"
+            started = time.perf_counter()
+            answer, thread_id = await get_single_response(question, model=settings.ASSISTANT_MODEL)
+    else:
+        answer, thread_id = await get_single_response(question, model=settings.ASSISTANT_MODEL)
+
+    latency = time.perf_counter() - started
+    route_stats[route].add(latency, failed=answer is None)
+
+    # Выборка для оценки качества маршрутизации: только метрики, без текста вопроса и ответа
+    if answer is not None and random.random() < settings.ROUTER_QUALITY_SAMPLE_RATE:
+        await async_amplitude_track(
+            user_id=current_user_id.get(),
+            event_type="route_quality_sample",
+            event_props={
+                "route": route,
+                "score": round(score, 3),
+                "latency_ms": round(latency * 1000),
+                "question_length": len(question),
+                "answer_length": len(answer),
+            }
+        )
+
+    return answer, thread_id
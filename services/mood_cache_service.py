@@ -0,0 +1,132 @@
+import asyncio
+from dataclasses import dataclass
+from io import BytesIO
+from typing import Awaitable, Callable, Optional
+from cachetools import TTLCache
+from config import settings
+
+
+@dataclass
+class MoodResult:
+    mood_analysis: str
+    voice: Optional[bytes] = None
+    phash: Optional[int] = None
+
+    @property
+    def cacheable(self) -> bool:
+        """Ошибки и ответы без озвучки не кэшируем, чтобы повторить их при следующем фото"""
+        if "Ошибка" in self.mood_analysis:
+            return False
+        return "ЛИЦА НЕТ" in self.mood_analysis or self.voice is not None
+
+
+def perceptual_hash(image_bytes: bytes) -> int:
+    """
+    Считает 64-битный difference hash (dHash) изображения.
+
+    Пересжатые Telegram копии одного и того же фото дают одинаковый
+    или отличающийся на несколько бит хэш.
+    """
+    # Pillow нужен только для фото, поэтому не замедляет запуск бота
+    from PIL import Image
+
+    with Image.open(BytesIO(image_bytes)) as image:
+        pixels = list(image.convert("L").resize((9, 8), Image.LANCZOS).getdata())
+
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+class MoodCache:
+    """
+    Кэш результатов анализа настроения с LRU и TTL вытеснением.
+
+    Первичный ключ — file_unique_id фото в Telegram, вторичный — перцептивный
+    хэш изображения. Одновременные запросы по одному ключу выполняются один раз.
+    """
+
+    def __init__(self, maxsize: int, ttl: int, max_distance: int) -> None:
+        self._by_file_id: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._by_phash: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._in_flight: dict[str, asyncio.Future] = {}
+        self._max_distance = max_distance
+
+    def get(self, file_unique_id: str) -> Optional[MoodResult]:
+        return self._by_file_id.get(file_unique_id)
+
+    def get_by_phash(self, phash: int) -> Optional[MoodResult]:
+        exact = self._by_phash.get(phash)
+        if exact is not None or self._max_distance <= 0:
+            return exact
+
+        for cached_hash in list(self._by_phash.keys()):
+            if (cached_hash ^ phash).bit_count() <= self._max_distance:
+                return self._by_phash.get(cached_hash)
+        return None
+
+    def put(self, file_unique_id: str, result: MoodResult) -> None:
+        if not result.cacheable:
+            return
+        self._by_file_id[file_unique_id] = result
+        if result.phash is not None:
+            self._by_phash[result.phash] = result
+
+    async def get_or_compute(
+        self,
+        file_unique_id: str,
+        compute: Callable[[], Awaitable[MoodResult]]
+    ) -> MoodResult:
+        """
+        Возвращает результат из кэша или вычисляет его, объединяя параллельные запросы.
+
+        Параметры:
+        - file_unique_id (str): Уникальный ID файла в Telegram.
+        - compute (Callable): Корутина-фабрика, выполняющая полный анализ фото.
+
+        Возвращает:
+        - MoodResult: Результат анализа настроения и озвучка.
+        """
+        cached = self.get(file_unique_id)
+        if cached is not None:
+            return cached
+
+        pending = self._in_flight.get(file_unique_id)
+        if pending is not None:
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                # Отменен обработчик, который вел вычисление, а не текущий:
+                # вычисляем сами вместо того, чтобы оставить пользователя без ответа
+                if not pending.cancelled() or asyncio.current_task().cancelling():
+                    raise
+                return await self.get_or_compute(file_unique_id, compute)
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[file_unique_id] = future
+        try:
+            result = await compute()
+            self.put(file_unique_id, result)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Исключение уже передано ожидающим, не оставляем его "не полученным"
+            future.exception()
+            raise
+        finally:
+            del self._in_flight[file_unique_id]
+
+
+mood_cache = MoodCache(
+    maxsize=settings.MOOD_CACHE_MAX_SIZE,
+    ttl=settings.MOOD_CACHE_TTL,
+    max_distance=settings.MOOD_CACHE_PHASH_DISTANCE
+)
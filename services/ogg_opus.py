@@ -0,0 +1,322 @@
+import struct
+from dataclasses import dataclass
+from typing import Iterator
+
+
+OGG_CAPTURE = b"OggS"
+OGG_HEADER = struct.Struct("<4sBBqIIIB")
+OPUS_HEAD = b"OpusHead"
+
+# Достаточно для заголовка первой страницы Ogg и сигнатуры OpusHead
+OGG_PREFIX_SIZE = 64
+# Максимальный размер страницы Ogg: хвост такой длины всегда содержит заголовок последней страницы
+OGG_TAIL_SIZE = OGG_HEADER.size + 255 + 255 * 255
+
+
+@dataclass
+class OggPage:
+    header_type: int
+    granule_position: int
+    serial: int
+    sequence: int
+    segments: list[int]
+    body: bytes
+
+    @property
+    def is_first(self) -> bool:
+        return bool(self.header_type & 0x02)
+
+
+def iter_pages(data: bytes) -> Iterator[OggPage]:
+    """
+    Последовательно разбирает страницы контейнера Ogg.
+
+    Исключения:
+    - ValueError: Если данные не являются корректным потоком Ogg.
+    """
+    offset = 0
+    while offset < len(data):
+        if len(data) - offset < OGG_HEADER.size:
+            raise ValueError("Обрезанный заголовок страницы Ogg")
+        capture, version, header_type, granule, serial, sequence, _crc, count = \
+            OGG_HEADER.unpack_from(data, offset)
+        if capture != OGG_CAPTURE or version != 0:
+            raise ValueError("Неверная сигнатура страницы Ogg")
+
+        table_start = offset + OGG_HEADER.size
+        segments = list(data[table_start:table_start + count])
+        body_start = table_start + count
+        body_end = body_start + sum(segments)
+        if len(segments) != count or body_end > len(data):
+            raise ValueError("Обрезанная страница Ogg")
+
+        yield OggPage(header_type, granule, serial, sequence, segments, data[body_start:body_end])
+        offset = body_end
+
+
+def is_ogg_opus_prefix(data: bytes) -> bool:
+    """
+    Проверяет по началу файла, что это Ogg с кодеком Opus.
+
+    Достаточно первых ~50 байт: заголовка первой страницы и начала OpusHead.
+    """
+    if len(data) < OGG_HEADER.size or not data.startswith(OGG_CAPTURE):
+        return False
+    header_type = data[5]
+    count = data[OGG_HEADER.size - 1]
+    body_start = OGG_HEADER.size + count
+    return bool(header_type & 0x02) and data[body_start:body_start + len(OPUS_HEAD)] == OPUS_HEAD
+
+
+def validate_ogg_opus(data: bytes) -> None:
+    """
+    Проверяет, что данные — целый поток Ogg/Opus, который Telegram покажет как голосовое.
+
+    Исключения:
+    - ValueError: Если контейнер поврежден или кодек не Opus.
+    """
+    if not is_ogg_opus_prefix(data):
+        raise ValueError("Аудио не является потоком Ogg/Opus")
+    for _ in iter_pages(data):
+        pass
+
+
+def ogg_opus_duration(data: bytes) -> float:
+    """
+    Длительность потока Ogg/Opus в секундах по позиции гранулы последней страницы.
+
+    Granule position в Opus всегда считается в отсчетах 48 кГц, из нее
+    вычитается pre-skip из заголовка OpusHead.
+    """
+    pre_skip = 0
+    last_granule = 0
+    for page in iter_pages(data):
+        if page.is_first and page.body.startswith(OPUS_HEAD):
+            pre_skip = struct.unpack_from("<H", page.body, 10)[0]
+        if page.granule_position > 0:
+            last_granule = page.granule_position
+    return max(last_granule - pre_skip, 0) / 48000
+
+
+def stream_duration(prefix: bytes, tail: bytes) -> float:
+    """
+    Длительность потока Ogg/Opus по его началу и концу, без хранения всего файла.
+
+    Заголовок последней страницы ищется с конца; сигнатура OggS внутри
+    аудиоданных пропускается, если страница с ней не заканчивается ровно
+    в конце потока.
+
+    Параметры:
+    - prefix (bytes): Начало потока с первой страницей (OpusHead), не меньше OGG_PREFIX_SIZE байт.
+    - tail (bytes): Последние OGG_TAIL_SIZE байт потока (или весь поток, если он короче).
+    """
+    if not is_ogg_opus_prefix(prefix):
+        return 0.0
+    body_start = OGG_HEADER.size + prefix[OGG_HEADER.size - 1]
+    pre_skip = struct.unpack_from("<H", prefix, body_start + 10)[0]
+
+    position = tail.rfind(OGG_CAPTURE)
+    while position >= 0:
+        if len(tail) - position >= OGG_HEADER.size:
+            _capture, version, _type, granule, _serial, _sequence, _crc, count = \
+                OGG_HEADER.unpack_from(tail, position)
+            table_start = position + OGG_HEADER.size
+            lacing = tail[table_start:table_start + count]
+            if version == 0 and len(lacing) == count and table_start + count + sum(lacing) == len(tail):
+                return max(granule - pre_skip, 0) / 48000
+        position = tail.rfind(OGG_CAPTURE, 0, position)
+    return 0.0
+
+
+def _crc_table() -> list[int]:
+    table = []
+    for byte in range(256):
+        crc = byte << 24
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x04C11DB7) if crc & 0x80000000 else crc << 1
+        table.append(crc & 0xFFFFFFFF)
+    return table
+
+
+_CRC_TABLE = _crc_table()
+
+
+def ogg_crc(data: bytes) -> int:
+    """CRC-32 страницы Ogg (полином 0x04C11DB7, без отражения, начальное значение 0)"""
+    crc = 0
+    for byte in data:
+        crc = ((crc << 8) & 0xFFFFFFFF) ^ _CRC_TABLE[(crc >> 24) ^ byte]
+    return crc
+
+
+def iter_packets(data: bytes) -> Iterator[bytes]:
+    """
+    Собирает пакеты кодека из страниц Ogg, в том числе продолженные на следующей странице.
+    """
+    pending = bytearray()
+    for page in iter_pages(data):
+        offset = 0
+        for size in page.segments:
+            pending += page.body[offset:offset + size]
+            offset += size
+            if size < 255:
+                yield bytes(pending)
+                pending.clear()
+    if pending:
+        yield bytes(pending)
+
+
+# Длительность кадра Opus в отсчетах 48 кГц по номеру конфигурации из TOC-байта
+_FRAME_SAMPLES = (
+    [480, 960, 1920, 2880] * 3    # SILK: 10, 20, 40, 60 мс
+    + [480, 960] * 2              # Hybrid: 10, 20 мс
+    + [120, 240, 480, 960] * 4    # CELT: 2.5, 5, 10, 20 мс
+)
+
+
+def opus_packet_samples(packet: bytes) -> int:
+    """Количество отсчетов 48 кГц в пакете Opus (RFC 6716, раздел 3.1)"""
+    if not packet:
+        return 0
+    toc = packet[0]
+    frame_count_code = toc & 0x03
+    if frame_count_code == 0:
+        frames = 1
+    elif frame_count_code in (1, 2):
+        frames = 2
+    else:
+        frames = packet[1] & 0x3F if len(packet) > 1 else 0
+    return _FRAME_SAMPLES[toc >> 3] * frames
+
+
+def _page(header_type: int, granule: int, serial: int, sequence: int, packets: list[bytes]) -> bytes:
+    lacing = bytearray()
+    for packet in packets:
+        lacing += b"\xff" * (len(packet) // 255) + bytes([len(packet) % 255])
+    header = OGG_HEADER.pack(OGG_CAPTURE, 0, header_type, granule, serial, sequence, 0, len(lacing))
+    page = bytearray(header + lacing + b"".join(packets))
+    struct.pack_into("<I", page, 22, ogg_crc(page))
+    return bytes(page)
+
+
+def mux_ogg_opus(
+    opus_head: bytes,
+    opus_tags: bytes,
+    packets: list[bytes],
+    serial: int = 1,
+    packets_per_page: int = 50
+) -> bytes:
+    """
+    Собирает корректный поток Ogg/Opus из заголовков и аудиопакетов.
+
+    Позиции гранул считаются заново от начала потока с учетом pre-skip,
+    поэтому фрагмент из середины записи воспроизводится и распознается
+    как самостоятельный файл.
+    """
+    pre_skip = struct.unpack_from("<H", opus_head, 10)[0]
+    pages = [
+        _page(0x02, 0, serial, 0, [opus_head]),
+        _page(0x00, 0, serial, 1, [opus_tags]),
+    ]
+    granule = pre_skip
+    for start in range(0, len(packets), packets_per_page):
+        chunk = packets[start:start + packets_per_page]
+        granule += sum(opus_packet_samples(packet) for packet in chunk)
+        last = start + packets_per_page >= len(packets)
+        pages.append(_page(0x04 if last else 0x00, granule, serial, len(pages), chunk))
+    return b"".join(pages)
+
+
+def _silent_runs(sizes: list[int], threshold: float) -> list[tuple[int, int]]:
+    """Интервалы [начало, конец) подряд идущих тихих пакетов"""
+    runs = []
+    start = None
+    for index, size in enumerate(sizes + [threshold + 1]):
+        if size <= threshold and start is None:
+            start = index
+        elif size > threshold and start is not None:
+            runs.append((start, index))
+            start = None
+    return runs
+
+
+def split_ogg_opus(
+    data: bytes,
+    segment_seconds: float,
+    overlap_seconds: float,
+    search_seconds: float = 5.0,
+    silence_ratio: float = 0.4
+) -> list[bytes]:
+    """
+    Делит запись Ogg/Opus на перекрывающиеся фрагменты по паузам в речи.
+
+    Декодирование не требуется: при VBR и DTX пакеты пауз заметно меньше
+    пакетов с речью, поэтому тишиной считаются пакеты размером не больше
+    silence_ratio от медианного. Граница фрагмента ставится в середину самой
+    длинной паузы в окне ±search_seconds от целевой точки, а при отсутствии
+    пауз — ровно в целевой точке. Каждый фрагмент начинается на
+    overlap_seconds раньше границы, чтобы не обрезать слова.
+
+    Параметры:
+    - data (bytes): Исходный поток Ogg/Opus.
+    - segment_seconds (float): Целевая длительность фрагмента.
+    - overlap_seconds (float): Перекрытие соседних фрагментов.
+    - search_seconds (float): Окно поиска паузы вокруг целевой границы.
+    - silence_ratio (float): Порог тишины относительно медианного размера пакета.
+
+    Возвращает:
+    - list[bytes]: Фрагменты, каждый — самостоятельный поток Ogg/Opus.
+
+    Исключения:
+    - ValueError: Если данные не являются потоком Ogg/Opus.
+    """
+    if not is_ogg_opus_prefix(data):
+        raise ValueError("Аудио не является потоком Ogg/Opus")
+    packets = list(iter_packets(data))
+    if len(packets) < 3:
+        return [data]
+    opus_head, opus_tags, audio = packets[0], packets[1], packets[2:]
+
+    # Время начала каждого пакета в секундах
+    starts = []
+    position = 0
+    for packet in audio:
+        starts.append(position / 48000)
+        position += opus_packet_samples(packet)
+    total = position / 48000
+    if total <= segment_seconds + overlap_seconds:
+        return [data]
+
+    sizes = [len(packet) for packet in audio]
+    threshold = sorted(sizes)[len(sizes) // 2] * silence_ratio
+    runs = _silent_runs(sizes, threshold)
+
+    cuts = [0]
+    target = segment_seconds
+    # Короткий остаток не выделяется в отдельный фрагмент
+    while target < total - segment_seconds / 2:
+        window = [
+            (start, end) for start, end in runs
+            if target - search_seconds <= starts[(start + end) // 2] <= target + search_seconds
+            and (start + end) // 2 > cuts[-1]
+        ]
+        if window:
+            start, end = max(window, key=lambda run: run[1] - run[0])
+            cut = (start + end) // 2
+        else:
+            cut = next((i for i, start_time in enumerate(starts) if start_time >= target), len(audio))
+        if cut >= len(audio):
+            break
+        cuts.append(cut)
+        target = starts[cut] + segment_seconds
+    cuts.append(len(audio))
+
+    segments = []
+    for index in range(len(cuts) - 1):
+        begin = cuts[index]
+        if index > 0:
+            begin_time = starts[begin] - overlap_seconds
+            while begin > 0 and starts[begin - 1] >= begin_time:
+                begin -= 1
+        segments.append(mux_ogg_opus(opus_head, opus_tags, audio[begin:cuts[index + 1]]))
+    return segments
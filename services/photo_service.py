@@ -1,5 +1,6 @@
 import openai
 from services.assistant_client_service import client
+from services.usage_service import track_usage
 
 
 prompt = """
@@ -23,19 +24,22 @@ prompt = """
 async def analyze_mood(photo_url: str) -> str:
     """Анализ настроения по фото через OpenAI"""
     try:
-        response = await client.chat.completions.create(
-            model="gpt-4-vision-preview",
-            messages=[
-                {
-                    "role": "user", 
-                    "content": [
-                        {"type": "text", "text": prompt},
-                        {"type": "image_url", "image_url": {"url": photo_url}},
-                    ],
-                }
-            ],
-            max_tokens=300,
-        )
+        async with track_usage("vision", "gpt-4-vision-preview") as usage:
+            response = await client.chat.completions.create(
+                model="gpt-4-vision-preview",
+                messages=[
+                    {
+                        "role": "user", 
+                        "content": [
+                            {"type": "text", "text": prompt},
+                            {"type": "image_url", "image_url": {"url": photo_url}},
+                        ],
+                    }
+                ],
+                max_tokens=300,
+            )
+            usage.image_count = 1
+            usage.add_tokens(response.usage)
         return response.choices[0].message.content
     except Exception as e:
         return f"Ошибка: {str(e)}"
\ No newline at end of file
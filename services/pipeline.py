@@ -0,0 +1,138 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Optional
+from services.checkpoint_service import StageCheckpoint
+
+
+class StageFailed(Exception):
+    """
+    Ожидаемая остановка конвейера: событие для Amplitude и сообщение пользователю.
+    """
+
+    def __init__(self, event_type: str, user_message: str):
+        super().__init__(event_type)
+        self.event_type = event_type
+        self.user_message = user_message
+
+
+@dataclass
+class Stage:
+    name: str
+    func: Callable[..., Awaitable[Any]]
+    depends_on: tuple[str, ...] = ()
+    checkpoint: bool = False
+
+
+@dataclass
+class Pipeline:
+    """
+    Планировщик этапов обработки сообщения с явными зависимостями.
+
+    Каждый этап запускается сразу, как только готовы этапы, от которых он
+    зависит, поэтому независимая работа выполняется параллельно. Результаты
+    зависимостей передаются в этап именованными аргументами. При ошибке
+    или отмене обработчика незавершенные этапы отменяются.
+
+    Результаты этапов с checkpoint=True сохраняются в контрольную точку
+    под ключами "{name}:{этап}", чтобы не пересекаться с другими обработчиками.
+    При повторной обработке апдейта такие этапы не выполняются, а этапы,
+    нужные только им, пропускаются.
+    """
+
+    name: str
+    checkpoint: Optional[StageCheckpoint] = None
+    stages: dict[str, Stage] = field(default_factory=dict)
+    timings: dict[str, float] = field(default_factory=dict)
+    resumed: list[str] = field(default_factory=list)
+
+    def stage(self, name: str, *depends_on: str, checkpoint: bool = False) -> Callable:
+        """
+        Декоратор, регистрирующий корутину как этап конвейера.
+
+        Параметры:
+        - depends_on (str): Этапы, результаты которых нужны этому этапу.
+        - checkpoint (bool): Сохранять результат этапа (должен сериализоваться в JSON).
+        """
+        for dependency in depends_on:
+            if dependency not in self.stages:
+                raise ValueError(f"Этап {name} зависит от необъявленного этапа {dependency}")
+
+        def decorator(func: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+            self.stages[name] = Stage(name, func, depends_on, checkpoint)
+            return func
+
+        return decorator
+
+    def _required(self, restored: dict[str, Any]) -> set[str]:
+        """Этапы, которые нужно выполнить: незавершенные конечные этапы и их незавершенные зависимости"""
+        dependencies = {dependency for stage in self.stages.values() for dependency in stage.depends_on}
+        required: set[str] = set()
+        # Зависимости объявляются раньше зависящих этапов, поэтому обход в обратном порядке
+        for stage in reversed(list(self.stages.values())):
+            if stage.name in restored:
+                continue
+            if stage.name not in dependencies or stage.name in required:
+                required.add(stage.name)
+                required.update(name for name in stage.depends_on if name not in restored)
+        return required
+
+    async def _run_stage(self, stage: Stage, tasks: dict[str, asyncio.Future]) -> Any:
+        dependencies = {name: await tasks[name] for name in stage.depends_on}
+        started = time.perf_counter()
+        try:
+            result = await stage.func(**dependencies)
+        finally:
+            self.timings[stage.name] = time.perf_counter() - started
+        if stage.checkpoint and self.checkpoint is not None:
+            await self.checkpoint.save(f"{self.name}:{stage.name}", result)
+        return result
+
+    async def run(self) -> dict[str, Any]:
+        """
+        Выполняет все этапы конвейера.
+
+        Возвращает:
+        - dict[str, Any]: Результаты этапов по имени.
+
+        Исключения:
+        - Первое исключение, выброшенное любым этапом (в том числе StageFailed).
+        """
+        started = time.perf_counter()
+        restored: dict[str, Any] = {}
+        if self.checkpoint is not None:
+            stored = await self.checkpoint.load()
+            restored = {
+                name: stored[f"{self.name}:{name}"] for name, stage in self.stages.items()
+                if stage.checkpoint and f"{self.name}:{name}" in stored
+            }
+        self.resumed = list(restored)
+        required = self._required(restored)
+
+        loop = asyncio.get_running_loop()
+        tasks: dict[str, asyncio.Future] = {}
+        for stage in self.stages.values():
+            if stage.name in restored:
+                tasks[stage.name] = loop.create_future()
+                tasks[stage.name].set_result(restored[stage.name])
+            elif stage.name in required:
+                tasks[stage.name] = asyncio.create_task(
+                    self._run_stage(stage, tasks),
+                    name=f"{self.name}:{stage.name}"
+                )
+
+        try:
+            done, pending = await asyncio.wait(tasks.values(), return_when=asyncio.FIRST_EXCEPTION)
+            failed = [task for task in done if not task.cancelled() and task.exception()]
+            if failed:
+                raise failed[0].exception()
+            return {name: task.result() for name, task in tasks.items()}
+        finally:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            self.timings["total"] = time.perf_counter() - started
+
+    def timings_ms(self) -> dict[str, int]:
+        """Длительности этапов в миллисекундах для аналитики"""
+        return {f"{name}_ms": round(seconds * 1000) for name, seconds in self.timings.items()}
@@ -0,0 +1,45 @@
+from typing import Optional
+
+
+# Типы апдейтов, у которых есть отправитель в поле "from"
+USER_UPDATE_FIELDS = (
+    "message",
+    "edited_message",
+    "callback_query",
+    "inline_query",
+    "chosen_inline_result",
+    "shipping_query",
+    "pre_checkout_query",
+    "poll_answer",
+    "my_chat_member",
+    "chat_member",
+    "chat_join_request",
+)
+
+
+def update_user_id(update: dict) -> Optional[int]:
+    """Возвращает telegram_id пользователя из сырого апдейта Telegram"""
+    for field in USER_UPDATE_FIELDS:
+        payload = update.get(field)
+        if payload is None:
+            continue
+        sender = payload.get("from") or payload.get("user")
+        if sender is not None:
+            return sender["id"]
+        chat = payload.get("chat")
+        if chat is not None:
+            return chat["id"]
+    return None
+
+
+def shard_for(update: dict, shards: int) -> int:
+    """
+    Номер воркера для апдейта.
+
+    Все апдейты одного пользователя попадают в один воркер, поэтому порядок
+    работы с его FSM-состоянием такой же, как при одном процессе.
+    """
+    user_id = update_user_id(update)
+    if user_id is None:
+        return update["update_id"] % shards
+    return user_id % shards
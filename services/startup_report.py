@@ -0,0 +1,37 @@
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+
+class StartupReport:
+    """
+    Разбивка времени запуска бота по этапам.
+
+    Длительности этапов (phase) и отметки времени от старта процесса (mark)
+    печатаются одной таблицей.
+    """
+
+    def __init__(self) -> None:
+        self.started_at = time.perf_counter()
+        self.phases: dict[str, float] = {}
+        self.marks: dict[str, float] = {}
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = time.perf_counter() - started
+
+    def mark(self, name: str) -> None:
+        self.marks[name] = time.perf_counter() - self.started_at
+
+    def print_report(self) -> None:
+        lines = ["Startup report:"]
+        lines += [f"  {name:<28} {seconds * 1000:8.0f} ms" for name, seconds in self.phases.items()]
+        lines += [f"  @ {name:<26} {seconds * 1000:8.0f} ms" for name, seconds in self.marks.items()]
+        print("\n".join(lines))
+
+
+startup_report = StartupReport()
@@ -1,14 +1,36 @@
 from io import BytesIO
-from typing import Optional
+from typing import AsyncIterator, Optional
 import aiohttp
+from config import settings
 from services.assistant_client_service import client
+from services.audio_buffer import StreamingVoiceFile
+from services.ogg_opus import (
+    OGG_PREFIX_SIZE,
+    OGG_TAIL_SIZE,
+    is_ogg_opus_prefix,
+    ogg_opus_duration,
+    stream_duration,
+    validate_ogg_opus,
+)
+from services.usage_service import track_usage
+
+
+AUDIO_FILENAMES = {
+    "opus": "output.ogg",
+    "mp3": "output.mp3",
+    "aac": "output.aac",
+    "flac": "output.flac",
+    "wav": "output.wav",
+    "pcm": "output.pcm",
+}
 
 
 async def text_to_audio(
     text: str,
     api_key: str,
     voice: str = "alloy",
-    model: str = "tts-1"
+    model: str = "tts-1",
+    response_format: str = settings.TTS_RESPONSE_FORMAT
 ) -> Optional[BytesIO]:
     """
     Преобразует текст в речь с использованием OpenAI TTS API.
@@ -16,32 +38,121 @@ async def text_to_audio(
     Параметры:
     - text (str): Текст для преобразования в речь.
     - api_key (str): OpenAI API ключ.
-    - voice (str, optional): Голос для генерации (alloy, echo, fable, onyx, nova, shimmer). 
+    - voice (str, optional): Голос для генерации (alloy, echo, fable, onyx, nova, shimmer).
       По умолчанию: "alloy".
     - model (str, optional): Модель TTS (tts-1, tts-1-hd). По умолчанию: "tts-1".
+    - response_format (str, optional): Формат аудио. По умолчанию из настроек ("opus"),
+      который Telegram принимает как голосовое сообщение без перекодирования.
 
     Возвращает:
-    - BytesIO: Файлоподобный объект с аудиоданными (MP3), если запрос успешен.
+    - BytesIO: Файлоподобный объект с аудиоданными, если запрос успешен.
     - None: В случае ошибки.
     """
 
     try:
         # Выполнение запроса на преобразование текста в речь
-        response = await client.audio.speech.create(
-            model=model,
-            voice=voice,
-            input=text
-        )
+        async with track_usage("tts", model) as usage:
+            response = await client.audio.speech.create(
+                model=model,
+                voice=voice,
+                input=text,
+                response_format=response_format
+            )
+            usage.characters = len(text)
 
-        # Получение аудиоданных из ответа
-        audio_bytes = response.content
+            # Получение аудиоданных из ответа
+            audio_bytes = response.content
+            if response_format == "opus":
+                validate_ogg_opus(audio_bytes)
+                usage.audio_seconds = ogg_opus_duration(audio_bytes)
 
         # Создание BytesIO объекта для хранения аудиоданных
         audio_file = BytesIO(audio_bytes)
-        audio_file.name = "output.mp3"
+        audio_file.name = AUDIO_FILENAMES.get(response_format, "output.mp3")
 
         return audio_file
 
     except Exception as e:
         print(f"Ошибка при преобразовании текста в речь: {e}")
         return None
+
+
+def text_to_audio_stream(
+    text: str,
+    voice: str = "alloy",
+    model: str = "tts-1",
+    filename: str = "response.ogg",
+    response_format: str = settings.TTS_RESPONSE_FORMAT,
+    streaming: bool = settings.TTS_STREAMING
+) -> StreamingVoiceFile:
+    """
+    Создает голосовой файл, который синтезируется во время отправки.
+
+    При streaming=True аудио из потокового ответа TTS API передается в загрузку
+    Telegram кусками, без накопления полного ответа в памяти. Для Opus начало
+    потока проверяется до отправки первого куска. Ошибки API возникают при
+    отправке сообщения и должны обрабатываться вызывающим кодом.
+
+    Параметры:
+    - text (str): Текст для преобразования в речь.
+    - voice (str, optional): Голос для генерации. По умолчанию: "alloy".
+    - model (str, optional): Модель TTS. По умолчанию: "tts-1".
+    - filename (str, optional): Имя файла для Telegram.
+    - response_format (str, optional): Формат аудио. По умолчанию из настроек.
+    - streaming (bool, optional): Использовать потоковый ответ TTS API.
+
+    Возвращает:
+    - StreamingVoiceFile: Файл для передачи в message.answer_voice.
+    """
+
+    async def streamed_source(chunk_size: int) -> AsyncIterator[bytes]:
+        async with track_usage("tts", model) as usage, client.audio.speech.with_streaming_response.create(
+            model=model,
+            voice=voice,
+            input=text,
+            response_format=response_format
+        ) as response:
+            usage.characters = len(text)
+            chunks = response.iter_bytes(chunk_size)
+            if response_format != "opus":
+                async for chunk in chunks:
+                    yield chunk
+                return
+
+            prefix = b""
+            async for chunk in chunks:
+                prefix += chunk
+                if len(prefix) >= OGG_PREFIX_SIZE:
+                    break
+            if not is_ogg_opus_prefix(prefix):
+                raise ValueError("TTS вернул аудио не в формате Ogg/Opus")
+            yield prefix
+
+            tail = prefix[-OGG_TAIL_SIZE:]
+            async for chunk in chunks:
+                if len(chunk) >= OGG_TAIL_SIZE:
+                    tail = chunk[-OGG_TAIL_SIZE:]
+                else:
+                    tail = (tail + chunk)[-OGG_TAIL_SIZE:]
+                yield chunk
+            usage.audio_seconds = stream_duration(prefix, tail)
+
+    async def buffered_source(chunk_size: int) -> AsyncIterator[bytes]:
+        async with track_usage("tts", model) as usage:
+            response = await client.audio.speech.create(
+                model=model,
+                voice=voice,
+                input=text,
+                response_format=response_format
+            )
+            usage.characters = len(text)
+            audio_bytes = response.content
+            if response_format == "opus":
+                validate_ogg_opus(audio_bytes)
+                usage.audio_seconds = ogg_opus_duration(audio_bytes)
+        view = memoryview(audio_bytes)
+        for offset in range(0, len(view), chunk_size):
+            yield view[offset:offset + chunk_size]
+
+    source = streamed_source if streaming else buffered_source
+    return StreamingVoiceFile(source, filename=filename)
@@ -0,0 +1,36 @@
+import re
+
+
+# Сколько слов на стыке фрагментов сравнивается при удалении повтора из перекрытия
+MAX_OVERLAP_WORDS = 12
+
+_PUNCTUATION = re.compile(r"[^\w]+")
+
+
+def _normalize_word(word: str) -> str:
+    return _PUNCTUATION.sub("", word.lower().replace("ё", "е"))
+
+
+def stitch_transcripts(parts: list[str]) -> str:
+    """
+    Склеивает тексты соседних фрагментов, убирая слова, распознанные дважды в перекрытии.
+
+    Ищется самое длинное совпадение конца предыдущего текста с началом следующего
+    (без учета регистра и пунктуации). Совпадение из одного слова учитывается,
+    только если слово длиннее трех букв, чтобы не съедать предлоги и союзы.
+    """
+    words: list[str] = []
+    for part in parts:
+        next_words = part.split()
+        if not words:
+            words = next_words
+            continue
+        previous = [_normalize_word(word) for word in words[-MAX_OVERLAP_WORDS:]]
+        current = [_normalize_word(word) for word in next_words[:MAX_OVERLAP_WORDS]]
+        overlap = 0
+        for size in range(min(len(previous), len(current)), 0, -1):
+            if previous[-size:] == current[:size] and (size > 1 or len(current[0]) > 3):
+                overlap = size
+                break
+        words += next_words[overlap:]
+    return " ".join(words)
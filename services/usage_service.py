@@ -0,0 +1,188 @@
+import asyncio
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from typing import AsyncIterator, Optional
+from sqlalchemy import func, insert, select
+from config import settings
+from pg_db.database import async_session_maker
+from pg_db.models import UsageRecord
+
+
+# Пользователь текущего апдейта; выставляется middlewares/usage.py
+current_user_id: ContextVar[Optional[int]] = ContextVar("current_user_id", default=None)
+
+# Оценочные цены OpenAI в USD: токены за 1M, Whisper за минуту, TTS за 1M символов
+TOKEN_PRICES = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4": (30.00, 60.00),
+    "gpt-4-vision-preview": (10.00, 30.00),
+}
+WHISPER_PRICE_PER_MINUTE = 0.006
+TTS_PRICES_PER_MILLION_CHARS = {"tts-1": 15.00, "tts-1-hd": 30.00}
+
+
+@dataclass
+class Usage:
+    """Потребление ресурсов одним вызовом API"""
+    stage: str
+    model: str
+    telegram_id: Optional[int] = None
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    audio_seconds: float = 0.0
+    characters: int = 0
+    image_count: int = 0
+    wall_time_ms: int = 0
+
+    def add_tokens(self, usage) -> None:
+        """Переносит токены из поля usage ответа OpenAI (chat completion или run)"""
+        if usage is None:
+            return
+        self.prompt_tokens += usage.prompt_tokens or 0
+        self.completion_tokens += usage.completion_tokens or 0
+
+    @property
+    def cost_usd(self) -> float:
+        prompt_price, completion_price = TOKEN_PRICES.get(self.model, (0.0, 0.0))
+        cost = (self.prompt_tokens * prompt_price + self.completion_tokens * completion_price) / 1_000_000
+        if self.model.startswith("whisper"):
+            cost += self.audio_seconds / 60 * WHISPER_PRICE_PER_MINUTE
+        cost += self.characters * TTS_PRICES_PER_MILLION_CHARS.get(self.model, 0.0) / 1_000_000
+        return cost
+
+
+@dataclass
+class Rollup:
+    calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    audio_seconds: float = 0.0
+    characters: int = 0
+    image_count: int = 0
+    wall_time_ms: int = 0
+    cost_usd: float = 0.0
+
+    def add(self, usage: Usage) -> None:
+        self.calls += 1
+        self.prompt_tokens += usage.prompt_tokens
+        self.completion_tokens += usage.completion_tokens
+        self.audio_seconds += usage.audio_seconds
+        self.characters += usage.characters
+        self.image_count += usage.image_count
+        self.wall_time_ms += usage.wall_time_ms
+        self.cost_usd += usage.cost_usd
+
+
+@dataclass
+class UsageAccountant:
+    """
+    Копит записи о потреблении в памяти и пачками сохраняет их в Postgres.
+
+    Параллельно ведет сводки по пользователям и этапам с момента запуска процесса.
+    """
+
+    batch_size: int
+    flush_interval: float
+    buffer: list[Usage] = field(default_factory=list)
+    by_user: dict[Optional[int], Rollup] = field(default_factory=lambda: defaultdict(Rollup))
+    by_stage: dict[str, Rollup] = field(default_factory=lambda: defaultdict(Rollup))
+    _flush_task: Optional[asyncio.Task] = None
+
+    def record(self, usage: Usage) -> None:
+        self.buffer.append(usage)
+        self.by_user[usage.telegram_id].add(usage)
+        self.by_stage[usage.stage].add(usage)
+        if len(self.buffer) >= self.batch_size and (self._flush_task is None or self._flush_task.done()):
+            self._flush_task = asyncio.create_task(self.flush())
+
+    async def flush(self) -> None:
+        if not self.buffer:
+            return
+        batch, self.buffer = self.buffer, []
+        rows = [{**asdict(usage), "cost_usd": usage.cost_usd} for usage in batch]
+        try:
+            async with async_session_maker() as session:
+                await session.execute(insert(UsageRecord), rows)
+                await session.commit()
+        except Exception as e:
+            print(f"Ошибка при сохранении статистики потребления: {e}")
+            # Возвращаем пачку, чтобы не потерять ее при временной недоступности БД
+            self.buffer = batch[-self.batch_size * 10:] + self.buffer
+
+    async def run(self) -> None:
+        """Фоновая периодическая запись накопленных данных"""
+        try:
+            while True:
+                await asyncio.sleep(self.flush_interval)
+                await self.flush()
+        finally:
+            await self.flush()
+
+
+usage_accountant = UsageAccountant(
+    batch_size=settings.USAGE_FLUSH_BATCH_SIZE,
+    flush_interval=settings.USAGE_FLUSH_INTERVAL
+)
+
+
+@asynccontextmanager
+async def track_usage(stage: str, model: str) -> AsyncIterator[Usage]:
+    """
+    Учитывает один вызов API: время выполнения и заполненные вызывающим кодом объемы.
+
+    Пример:
+        async with track_usage("stt", "whisper-1") as usage:
+            ...
+            usage.audio_seconds = transcription.duration
+    """
+    usage = Usage(stage=stage, model=model, telegram_id=current_user_id.get())
+    started = time.perf_counter()
+    try:
+        yield usage
+    finally:
+        usage.wall_time_ms = round((time.perf_counter() - started) * 1000)
+        usage_accountant.record(usage)
+
+
+async def usage_rollups(group_by: str = "stage", limit: int = 50) -> list[tuple]:
+    """
+    Сводка потребления из БД для планирования мощностей.
+
+    Параметры:
+    - group_by (str): "stage" или "user".
+    - limit (int): Максимальное количество строк.
+    """
+    key = UsageRecord.stage if group_by == "stage" else UsageRecord.telegram_id
+    stmt = (
+        select(
+            key,
+            func.count(),
+            func.sum(UsageRecord.prompt_tokens),
+            func.sum(UsageRecord.completion_tokens),
+            func.sum(UsageRecord.audio_seconds),
+            func.sum(UsageRecord.image_count),
+            func.avg(UsageRecord.wall_time_ms),
+            func.sum(UsageRecord.cost_usd),
+        )
+        .group_by(key)
+        .order_by(func.sum(UsageRecord.cost_usd).desc())
+        .limit(limit)
+    )
+    async with async_session_maker() as session:
+        result = await session.execute(stmt)
+        return [tuple(row) for row in result.all()]
+
+
+if __name__ == "__main__":
+    import sys
+
+    group_by = sys.argv[1] if len(sys.argv) > 1 else "stage"
+    print(f"{group_by:>14} {'calls':>8} {'prompt':>10} {'compl':>10} {'audio,s':>9} {'images':>7} {'avg ms':>8} {'cost $':>9}")
+    for row in asyncio.run(usage_rollups(group_by)):
+        key, calls, prompt, completion, audio, images, wall, cost = row
+        print(f"{str(key):>14} {calls:>8} {prompt or 0:>10} {completion or 0:>10} "
+              f"{audio or 0:>9.1f} {images or 0:>7} {wall or 0:>8.0f} {cost or 0:>9.4f}")
@@ -0,0 +1,86 @@
+import re
+from collections import Counter
+from typing import AsyncIterator, Iterable
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from pg_db.models import User, Value, ValueCounter
+
+
+EXPORT_COLUMNS = ("telegram_id", "value", "normalized_value")
+
+_PUNCTUATION = re.compile(r"[^\w\s-]+")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_value(value: str) -> str:
+    """
+    Приводит ценность к каноническому виду для агрегации.
+
+    "  Семья!" и "семья" считаются одной ценностью: нижний регистр, ё -> е,
+    без знаков препинания и лишних пробелов.
+    """
+    value = value.lower().replace("ё", "е")
+    value = _PUNCTUATION.sub(" ", value)
+    return _SPACES.sub(" ", value).strip(" -")
+
+
+async def increment_value_counters(session: AsyncSession, normalized_values: Iterable[str]) -> None:
+    """
+    Увеличивает счетчики ценностей в сводной таблице value_counters.
+
+    Выполняется в транзакции вызывающего кода, одним upsert на все ценности.
+    """
+    counts = Counter(value for value in normalized_values if value)
+    if not counts:
+        return
+
+    stmt = insert(ValueCounter).values(
+        [{"normalized_value": value, "count": count} for value, count in counts.items()]
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[ValueCounter.normalized_value],
+        set_={"count": ValueCounter.count + stmt.excluded.count}
+    )
+    await session.execute(stmt)
+
+
+async def top_values(session: AsyncSession, limit: int = 10) -> list[tuple[str, int]]:
+    """
+    Самые частые ценности пользователей по предрасчитанным счетчикам.
+
+    Возвращает:
+    - list[tuple[str, int]]: Пары (ценность, количество) по убыванию количества.
+    """
+    stmt = (
+        select(ValueCounter.normalized_value, ValueCounter.count)
+        .order_by(ValueCounter.count.desc())
+        .limit(limit)
+    )
+    result = await session.execute(stmt)
+    return [tuple(row) for row in result.all()]
+
+
+async def iter_user_values(session: AsyncSession, batch_size: int = 1000) -> AsyncIterator[list[tuple]]:
+    """
+    Потоково отдает пары пользователь-ценность пачками через серверный курсор.
+
+    В памяти одновременно находится не больше одной пачки, независимо
+    от размера таблицы.
+
+    Параметры:
+    - session (AsyncSession): Асинхронная сессия SQLAlchemy.
+    - batch_size (int): Размер пачки строк.
+
+    Возвращает:
+    - AsyncIterator[list[tuple]]: Пачки строк (telegram_id, value, normalized_value).
+    """
+    stmt = (
+        select(User.telegram_id, Value.value, Value.normalized_value)
+        .join(Value, Value.user_id == User.id)
+        .order_by(Value.id)
+        .execution_options(yield_per=batch_size)
+    )
+    result = await session.stream(stmt)
+    async for partition in result.partitions(batch_size):
+        yield [tuple(row) for row in partition]
@@ -0,0 +1,95 @@
+import re
+from typing import Optional
+from services.values_analytics_service import normalize_value
+
+
+# Канонические ценности и их распространенные формулировки.
+# Размытые ответы ("счастье", "деньги") сюда намеренно не входят:
+# по правилам VALUES_SYSTEM_PROMPT их нужно уточнять у пользователя.
+VALUES_LEXICON: dict[str, tuple[str, ...]] = {
+    "семья": ("семья", "семью", "родные", "близкие", "родные и близкие", "дети", "родители", "семейные ценности"),
+    "здоровье": ("здоровье", "здоровый образ жизни", "зож"),
+    "свобода": ("свобода", "свободу", "личная свобода"),
+    "независимость": ("независимость", "самостоятельность"),
+    "любовь": ("любовь",),
+    "дружба": ("дружба", "друзья", "друзей"),
+    "карьера": ("карьера", "карьерный рост", "работа", "профессия", "профессиональный рост"),
+    "саморазвитие": ("саморазвитие", "развитие", "личностный рост", "самосовершенствование", "рост"),
+    "образование": ("образование", "знания", "учеба", "обучение"),
+    "финансовая стабильность": ("финансовая стабильность", "финансовая независимость", "достаток"),
+    "стабильность": ("стабильность",),
+    "безопасность": ("безопасность",),
+    "честность": ("честность", "правда"),
+    "доброта": ("доброта",),
+    "уважение": ("уважение",),
+    "справедливость": ("справедливость",),
+    "ответственность": ("ответственность",),
+    "верность": ("верность", "преданность"),
+    "творчество": ("творчество", "креативность", "искусство"),
+    "путешествия": ("путешествия", "путешествовать"),
+    "вера": ("вера", "религия", "бог"),
+    "природа": ("природа", "экология"),
+    "спорт": ("спорт",),
+    "спокойствие": ("спокойствие", "душевное спокойствие", "гармония"),
+    "помощь людям": ("помощь людям", "помогать людям", "помощь другим"),
+    "самореализация": ("самореализация",),
+}
+
+_SYNONYMS: dict[str, str] = {
+    normalize_value(synonym): canonical
+    for canonical, synonyms in VALUES_LEXICON.items()
+    for synonym in synonyms
+}
+
+# Вводные слова, после которых идет сам список
+_LEAD_INS = re.compile(
+    r"^(ну|наверное|думаю|я думаю|мои ценности|мои жизненные ценности|для меня важны|"
+    r"для меня важно|для меня|я ценю|самое важное|это)\b[\s,:\-—]*",
+    re.IGNORECASE
+)
+_SEPARATORS = re.compile(r"\s*(?:[,;\n.]|\s+и\s+|\s+а также\s+)\s*", re.IGNORECASE)
+
+MIN_VALUES = 3
+MAX_VALUES = 5
+
+
+def _strip_lead_ins(text: str) -> str:
+    previous = None
+    while previous != text:
+        previous = text
+        text = _LEAD_INS.sub("", text.strip())
+    return text
+
+
+def extract_values(text: str) -> Optional[list[str]]:
+    """
+    Детерминированно извлекает ценности из четкого перечисления.
+
+    Срабатывает только на уверенных ответах: 3-5 пунктов, каждый из которых
+    есть в словаре ценностей, без вопросов. В остальных случаях возвращает
+    None, и ответ разбирает LLM.
+
+    Параметры:
+    - text (str): Распознанный ответ пользователя.
+
+    Возвращает:
+    - Optional[list[str]]: Канонические названия ценностей или None.
+    """
+    if "?" in text:
+        return None
+
+    items = [normalize_value(item) for item in _SEPARATORS.split(_strip_lead_ins(text))]
+    items = [_strip_lead_ins(item) for item in items if item]
+    items = [item for item in items if item]
+
+    values: list[str] = []
+    for item in items:
+        canonical = _SYNONYMS.get(item)
+        if canonical is None:
+            return None
+        if canonical not in values:
+            values.append(canonical)
+
+    if not MIN_VALUES <= len(values) <= MAX_VALUES:
+        return None
+    return values
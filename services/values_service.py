@@ -3,6 +3,7 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from pg_db.database import async_session_maker
 from pg_db.models import User, Value
+from services.values_analytics_service import increment_value_counters, normalize_value
     
     
 async def user_has_values(telegram_id: int) -> bool:
@@ -30,9 +31,13 @@ async def save_user_values(session: AsyncSession, telegram_id: int, values: list
         session.add(user)
         await session.flush()  
 
-        # Создаем записи ценностей
-        user_values = [Value(user_id=user.id, value=v) for v in values]
+        # Создаем записи ценностей и обновляем сводные счетчики в той же транзакции
+        user_values = [
+            Value(user_id=user.id, value=v, normalized_value=normalize_value(v))
+            for v in values
+        ]
         session.add_all(user_values)
+        await increment_value_counters(session, (v.normalized_value for v in user_values))
 
         await session.commit()
         return json.dumps({"status": "success", "message": f"Успешно сохранено {len(values)} ценностей."})
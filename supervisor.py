@@ -0,0 +1,295 @@
+import asyncio
+import multiprocessing
+import os
+import queue as queue_module
+import signal
+import time
+from collections import defaultdict
+from typing import Optional
+import aiohttp
+import orjson
+import redis.asyncio as redis
+import uvloop
+from aiogram import Bot, Dispatcher
+from aiogram.fsm.storage.redis import RedisStorage
+from config import settings
+from amplitude_dep import amplitude_executor
+from handlers.admin_handlers import admin_router
+from handlers.user_handlers import user_router
+from middlewares.journal import UpdateJournalMiddleware
+from middlewares.throttling import ThrottlingMiddleware
+from middlewares.usage import UsageContextMiddleware
+import services.assistant_client_state
+from services.assistant_client_service import set_provisioning_source, start_assistant_provisioning
+from services.assistant_client_state import client
+from services.checkpoint_service import CheckpointStore, UpdateJournal
+from services.http_transport import create_telegram_session
+from services.loop_monitor import loop_watchdog
+from services.sharding import shard_for
+from services.usage_service import usage_accountant
+
+
+GET_UPDATES_URL = "https://api.telegram.org/bot{token}/getUpdates"
+POLLING_TIMEOUT = 30
+# Как часто цикл чтения очереди воркера просыпается без апдейтов, чтобы обновить heartbeat
+QUEUE_POLL_INTERVAL = 1.0
+STOP = None
+
+
+def create_redis() -> redis.Redis:
+    return redis.Redis(
+        host=settings.REDIS_HOST,
+        port=settings.REDIS_PORT,
+        db=settings.REDIS_DB,
+        password=settings.REDIS_PASSWORD,
+        decode_responses=True
+    )
+
+
+def worker_journal(redis_connection: redis.Redis, index: int) -> UpdateJournal:
+    """Журнал воркера: супервизор пишет в него апдейты до отправки в очередь, воркер удаляет после обработки"""
+    return UpdateJournal(redis_connection, f"worker{index}")
+
+
+def run_worker(index: int, queue: multiprocessing.Queue, heartbeats, assistant_id: Optional[str]) -> None:
+    """Точка входа процесса-воркера: свой event loop на uvloop"""
+    # Ctrl+C обрабатывает супервизор и останавливает воркеры через очередь
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    uvloop.run(worker_main(index, queue, heartbeats, assistant_id))
+
+
+async def worker_main(index: int, queue: multiprocessing.Queue, heartbeats, assistant_id: Optional[str]) -> None:
+    """
+    Обрабатывает апдейты своего шарда пользователей.
+
+    Параметры:
+    - index (int): Номер воркера.
+    - queue (multiprocessing.Queue): Очередь апдейтов и служебных сообщений от супервизора.
+    - heartbeats: Общий массив, куда цикл чтения очереди пишет время последней итерации.
+    - assistant_id (str, optional): ID ассистента, если он уже создан супервизором.
+    """
+    loop = asyncio.get_running_loop()
+
+    # Ассистента создает супервизор, воркер только ждет его ID
+    assistant_ready: asyncio.Future = loop.create_future()
+    set_provisioning_source(assistant_ready)
+    if assistant_id is not None:
+        services.assistant_client_state.assistant_id = assistant_id
+        assistant_ready.set_result(assistant_id)
+
+    redis_connection = create_redis()
+    bot = Bot(token=settings.BOT_TOKEN, session=create_telegram_session())
+    dp = Dispatcher(storage=RedisStorage(redis_connection))
+    dp["checkpoints"] = CheckpointStore(redis_connection)
+    # Журнал у каждого воркера свой: перезапущенный воркер продолжает свои прерванные
+    # апдейты и получает те, что остались в очереди убитого процесса
+    journal = worker_journal(redis_connection, index)
+    dp.update.outer_middleware(UsageContextMiddleware())
+    dp.update.outer_middleware(UpdateJournalMiddleware(journal, supervised=True))
+    dp.message.middleware(ThrottlingMiddleware(redis_connection))
+    dp.include_router(admin_router)
+    dp.include_router(user_router)
+
+    usage_task = asyncio.create_task(usage_accountant.run())
+    if settings.LOOP_WATCHDOG_ENABLED:
+        loop_watchdog.start()
+    handler_tasks: set[asyncio.Task] = set()
+
+    def handle(update: dict) -> None:
+        task = asyncio.create_task(dp.feed_raw_update(bot, update))
+        handler_tasks.add(task)
+        task.add_done_callback(handler_tasks.discard)
+
+    replayed: set[int] = set()
+    for update in await journal.pending():
+        replayed.add(update["update_id"])
+        handle(update)
+
+    try:
+        while True:
+            # Heartbeat пишет сам цикл чтения: он показывает, что апдейты забираются
+            # из очереди, а не только то, что жив event loop
+            heartbeats[index] = time.time()
+            try:
+                item = await loop.run_in_executor(None, queue.get, True, QUEUE_POLL_INTERVAL)
+            except queue_module.Empty:
+                continue
+            if item is STOP:
+                break
+
+            kind, payload = item
+            if kind == "assistant":
+                services.assistant_client_state.assistant_id = payload
+                if not assistant_ready.done():
+                    assistant_ready.set_result(payload)
+                continue
+
+            if payload["update_id"] in replayed:
+                # Супервизор записал апдейт в журнал до отправки, и он уже запущен из журнала
+                replayed.discard(payload["update_id"])
+                continue
+            handle(payload)
+    finally:
+        # Новые апдейты не читаются; начатые обработчики получают SHUTDOWN_DRAIN_TIMEOUT
+        # на завершение, незавершенные остаются в журнале до перезапуска
+        if handler_tasks:
+            _, pending = await asyncio.wait(set(handler_tasks), timeout=settings.SHUTDOWN_DRAIN_TIMEOUT)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        loop_watchdog.stop()
+        usage_task.cancel()
+        await asyncio.gather(usage_task, return_exceptions=True)
+        await bot.session.close()
+        await client.close()
+        await redis_connection.close()
+        amplitude_executor.shutdown(wait=True)
+
+
+class Supervisor:
+    """
+    Запускает N процессов-воркеров и распределяет между ними апдейты Telegram.
+
+    Супервизор единственный получает апдейты (getUpdates допускает одного
+    потребителя), разбирает только JSON и отправляет апдейт в воркер по
+    telegram_id. Зависшие и упавшие воркеры перезапускаются.
+
+    Каждый апдейт записывается в журнал своего воркера до отправки в очередь
+    и удаляется воркером после обработки, поэтому апдейты из очереди
+    перезапущенного воркера не теряются.
+    """
+
+    def __init__(self, workers: int) -> None:
+        self.context = multiprocessing.get_context("spawn")
+        self.workers = workers
+        self.queues = [self.context.Queue() for _ in range(workers)]
+        self.heartbeats = self.context.Array("d", workers)
+        self.processes: list[Optional[multiprocessing.Process]] = [None] * workers
+        self.assistant_id: Optional[str] = None
+        self.redis = create_redis()
+        self.journals = [worker_journal(self.redis, index) for index in range(workers)]
+
+    def start_worker(self, index: int) -> None:
+        self.heartbeats[index] = time.time()
+        if self.processes[index] is not None:
+            # Убитый воркер мог держать внутреннюю блокировку очереди в queue.get,
+            # и новый воркер навсегда завис бы на ней. Апдейты из старой очереди
+            # уже записаны в журнал воркера, и новый процесс повторит их при запуске.
+            self.queues[index].close()
+            self.queues[index].cancel_join_thread()
+            self.queues[index] = self.context.Queue()
+            if self.assistant_id is not None:
+                self.queues[index].put(("assistant", self.assistant_id))
+        process = self.context.Process(
+            target=run_worker,
+            args=(index, self.queues[index], self.heartbeats, self.assistant_id),
+            name=f"bot-worker-{index}",
+            daemon=True
+        )
+        process.start()
+        self.processes[index] = process
+
+    async def monitor(self) -> None:
+        """Перезапускает воркеры, которые упали или перестали обновлять heartbeat"""
+        while True:
+            await asyncio.sleep(settings.SUPERVISOR_HEALTH_INTERVAL)
+            now = time.time()
+            for index, process in enumerate(self.processes):
+                stale = now - self.heartbeats[index] > settings.WORKER_HEARTBEAT_TIMEOUT
+                if process.is_alive() and not stale:
+                    continue
+                print(f"Воркер {index} не отвечает (exitcode={process.exitcode}), перезапуск")
+                if process.is_alive():
+                    process.kill()
+                await asyncio.to_thread(process.join)
+                self.start_worker(index)
+
+    async def provision_assistant(self) -> None:
+        """Создает ассистента один раз и рассылает его ID всем воркерам"""
+        while self.assistant_id is None:
+            try:
+                self.assistant_id = await start_assistant_provisioning()
+            except Exception:
+                await asyncio.sleep(10)
+        for queue in self.queues:
+            queue.put(("assistant", self.assistant_id))
+
+    async def poll(self) -> None:
+        """Получает апдейты long polling и раскладывает их по очередям воркеров"""
+        url = GET_UPDATES_URL.format(token=settings.BOT_TOKEN)
+        offset: Optional[int] = None
+        connector = aiohttp.TCPConnector(ttl_dns_cache=settings.HTTP_DNS_CACHE_TTL)
+        timeout = aiohttp.ClientTimeout(total=POLLING_TIMEOUT + settings.HTTP_CONNECT_TIMEOUT)
+
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            while True:
+                params = {"timeout": POLLING_TIMEOUT}
+                if offset is not None:
+                    params["offset"] = offset
+                try:
+                    async with session.get(url, params=params) as resp:
+                        body = orjson.loads(await resp.read())
+                    if not body.get("ok"):
+                        raise RuntimeError(body.get("description"))
+                except Exception as e:
+                    print(f"Ошибка при получении апдейтов: {e}")
+                    await asyncio.sleep(5)
+                    continue
+
+                batches: dict[int, list[dict]] = defaultdict(list)
+                for update in body["result"]:
+                    offset = update["update_id"] + 1
+                    batches[shard_for(update, self.workers)].append(update)
+                # Сначала журнал, потом очередь: апдейт, который воркер не успел забрать,
+                # переживает перезапуск воркера, хотя Telegram уже считает его доставленным
+                await asyncio.gather(*(
+                    self.journals[index].add_many(updates) for index, updates in batches.items()
+                ))
+                for index, updates in batches.items():
+                    for update in updates:
+                        self.queues[index].put(("update", update))
+
+    async def run(self) -> None:
+        for index in range(self.workers):
+            self.start_worker(index)
+
+        # SIGTERM (docker stop, systemd) останавливает прием апдейтов так же, как Ctrl+C
+        stop_requested = asyncio.Event()
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop_requested.set)
+
+        provisioning = asyncio.create_task(self.provision_assistant())
+        tasks = [
+            asyncio.create_task(self.poll()),
+            asyncio.create_task(self.monitor()),
+            asyncio.create_task(stop_requested.wait()),
+        ]
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()
+        finally:
+            for task in tasks + [provisioning]:
+                task.cancel()
+            await self.stop()
+
+    async def stop(self) -> None:
+        for queue in self.queues:
+            queue.put(STOP)
+        for process in self.processes:
+            await asyncio.to_thread(process.join, settings.WORKER_SHUTDOWN_TIMEOUT)
+            if process.is_alive():
+                process.kill()
+        await client.close()
+        await self.redis.close()
+
+
+def main() -> None:
+    workers = settings.WORKER_COUNT or os.cpu_count() or 1
+    try:
+        uvloop.run(Supervisor(workers).run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
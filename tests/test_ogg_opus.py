@@ -0,0 +1,132 @@
+import struct
+from services.ogg_opus import (
+    OGG_HEADER,
+    OGG_PREFIX_SIZE,
+    OGG_TAIL_SIZE,
+    is_ogg_opus_prefix,
+    iter_packets,
+    mux_ogg_opus,
+    ogg_crc,
+    ogg_opus_duration,
+    opus_packet_samples,
+    split_ogg_opus,
+    stream_duration,
+    validate_ogg_opus,
+)
+
+
+PRE_SKIP = 312
+OPUS_HEAD = b"OpusHead" + struct.pack("<BBHIhB", 1, 1, PRE_SKIP, 48000, 0, 0)
+OPUS_TAGS = b"OpusTags" + struct.pack("<I", 4) + b"test" + struct.pack("<I", 0)
+# CELT, 20 мс, один кадр
+TOC_20MS = 31 << 3
+
+
+def packet(index: int, size: int) -> bytes:
+    """Пакет с номером внутри, чтобы после нарезки можно было сравнить пакеты по содержимому"""
+    return bytes([TOC_20MS]) + index.to_bytes(4, "big") + b"\x55" * (size - 5)
+
+
+def speech_with_pauses(seconds: int, speech_seconds: int = 9, pause_seconds: int = 1) -> list[bytes]:
+    """Речь крупными пакетами (часть — длиннее 255 байт) и секундные паузы мелкими пакетами"""
+    packets = []
+    for index in range(seconds * 50):
+        in_pause = index % ((speech_seconds + pause_seconds) * 50) >= speech_seconds * 50
+        packets.append(packet(index, 8 if in_pause else 120 + (index % 3) * 100))
+    return packets
+
+
+def raw_pages(data: bytes) -> list[tuple[tuple, bytes]]:
+    pages = []
+    offset = 0
+    while offset < len(data):
+        header = OGG_HEADER.unpack_from(data, offset)
+        count = header[-1]
+        lacing = data[offset + OGG_HEADER.size:offset + OGG_HEADER.size + count]
+        end = offset + OGG_HEADER.size + count + sum(lacing)
+        pages.append((header, data[offset:end]))
+        offset = end
+    return pages
+
+
+def test_ogg_crc_check_value():
+    assert ogg_crc(b"123456789") == 0x89A1897F
+    assert ogg_crc(b"") == 0
+
+
+def test_opus_packet_samples():
+    assert opus_packet_samples(b"") == 0
+    assert opus_packet_samples(bytes([TOC_20MS])) == 960
+    # SILK 60 мс
+    assert opus_packet_samples(bytes([3 << 3])) == 2880
+    # CELT 2.5 мс, два кадра
+    assert opus_packet_samples(bytes([(16 << 3) | 1])) == 240
+    # Произвольное число кадров: пять кадров SILK по 10 мс
+    assert opus_packet_samples(bytes([(0 << 3) | 3, 5])) == 2400
+
+
+def test_mux_produces_valid_pages():
+    packets = speech_with_pauses(5)
+    data = mux_ogg_opus(OPUS_HEAD, OPUS_TAGS, packets, serial=7)
+
+    assert is_ogg_opus_prefix(data)
+    validate_ogg_opus(data)
+    pages = raw_pages(data)
+    for sequence, (header, page) in enumerate(pages):
+        _capture, _version, header_type, _granule, serial, page_sequence, crc, _count = header
+        assert serial == 7
+        assert page_sequence == sequence
+        assert ogg_crc(page[:22] + b"\x00" * 4 + page[26:]) == crc
+    assert pages[0][0][2] == 0x02
+    assert pages[-1][0][2] == 0x04
+    assert pages[-1][0][3] == PRE_SKIP + len(packets) * 960
+
+
+def test_mux_round_trips_packets_and_duration():
+    packets = speech_with_pauses(5)
+    data = mux_ogg_opus(OPUS_HEAD, OPUS_TAGS, packets)
+
+    assert list(iter_packets(data)) == [OPUS_HEAD, OPUS_TAGS] + packets
+    assert ogg_opus_duration(data) == 5.0
+    assert stream_duration(data[:OGG_PREFIX_SIZE], data[-OGG_TAIL_SIZE:]) == 5.0
+
+
+def test_stream_duration_finds_last_page_in_tail():
+    # Большие пакеты: последняя страница длиннее 8 КБ, внутри аудиоданных встречается OggS
+    packets = [packet(index, 250)[:5] + b"OggS" + b"\x00" * 241 for index in range(250)]
+    data = mux_ogg_opus(OPUS_HEAD, OPUS_TAGS, packets)
+
+    assert len(raw_pages(data)[-1][1]) > 8192
+    assert stream_duration(data[:OGG_PREFIX_SIZE], data[-OGG_TAIL_SIZE:]) == ogg_opus_duration(data) == 5.0
+    assert stream_duration(data[:OGG_PREFIX_SIZE], data[-100:]) == 0.0
+
+
+def test_split_short_stream_is_unchanged():
+    data = mux_ogg_opus(OPUS_HEAD, OPUS_TAGS, speech_with_pauses(10))
+    assert split_ogg_opus(data, segment_seconds=20, overlap_seconds=2) == [data]
+
+
+def test_split_cuts_in_pauses_with_overlap():
+    packets = speech_with_pauses(60)
+    data = mux_ogg_opus(OPUS_HEAD, OPUS_TAGS, packets)
+
+    segments = split_ogg_opus(data, segment_seconds=20, overlap_seconds=2, search_seconds=5)
+
+    assert len(segments) == 3
+    restored: list[bytes] = []
+    for index, segment in enumerate(segments):
+        validate_ogg_opus(segment)
+        audio = list(iter_packets(segment))[2:]
+        assert ogg_opus_duration(segment) == len(audio) * 0.02
+        assert ogg_opus_duration(segment) <= 20 + 5 + 2
+        if index < len(segments) - 1:
+            # Граница фрагмента приходится на паузу
+            assert len(audio[-1]) == 8
+        if restored:
+            # Начало фрагмента повторяет 2 с конца предыдущего
+            overlap = restored.index(audio[0])
+            assert restored[overlap:] == audio[:len(restored) - overlap]
+            assert (len(restored) - overlap) * 0.02 == 2.0
+            audio = audio[len(restored) - overlap:]
+        restored += audio
+    assert restored == packets
@@ -0,0 +1,22 @@
+from services.transcript_stitching import stitch_transcripts
+
+
+def test_removes_repeated_words_from_overlap():
+    parts = ["Я плохо сплю по ночам", "по ночам, и утром устаю.", "Утром устаю, что делать?"]
+    assert stitch_transcripts(parts) == "Я плохо сплю по ночам и утром устаю. что делать?"
+
+
+def test_single_short_word_is_kept():
+    assert stitch_transcripts(["я пришел в", "в кабинет"]) == "я пришел в в кабинет"
+
+
+def test_overlap_ignores_case_and_yo():
+    assert stitch_transcripts(["сильная тревога ещё", "Тревога еще держится"]) == "сильная тревога ещё держится"
+
+
+def test_single_long_word_is_removed():
+    assert stitch_transcripts(["мне страшно", "Страшно засыпать"]) == "мне страшно засыпать"
+
+
+def test_without_overlap_texts_are_joined():
+    assert stitch_transcripts(["", "первый", "второй"]) == "первый второй"
@@ -0,0 +1,76 @@
+import argparse
+import asyncio
+import csv
+from pg_db.database import async_session_maker
+from services.values_analytics_service import EXPORT_COLUMNS, iter_user_values, top_values
+
+
+async def export_csv(output: str, batch_size: int) -> int:
+    """Потоковая выгрузка пользователей и ценностей в CSV"""
+    total = 0
+    async with async_session_maker() as session:
+        with open(output, "w", newline="", encoding="utf-8") as file:
+            writer = csv.writer(file)
+            writer.writerow(EXPORT_COLUMNS)
+            async for batch in iter_user_values(session, batch_size):
+                writer.writerows(batch)
+                total += len(batch)
+    return total
+
+
+async def export_parquet(output: str, batch_size: int) -> int:
+    """Потоковая выгрузка в Parquet: каждая пачка записывается отдельной row group"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise SystemExit("Для выгрузки в Parquet установите pyarrow: pip install pyarrow")
+
+    schema = pa.schema([
+        ("telegram_id", pa.int64()),
+        ("value", pa.string()),
+        ("normalized_value", pa.string()),
+    ])
+    total = 0
+    async with async_session_maker() as session:
+        with pq.ParquetWriter(output, schema) as writer:
+            async for batch in iter_user_values(session, batch_size):
+                columns = list(zip(*batch))
+                writer.write_table(pa.Table.from_arrays(
+                    [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+                    schema=schema
+                ))
+                total += len(batch)
+    return total
+
+
+async def print_top(limit: int) -> None:
+    async with async_session_maker() as session:
+        for value, count in await top_values(session, limit):
+            print(f"{count:>8}  {value}")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Аналитика ценностей пользователей")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export = subparsers.add_parser("export", help="Выгрузить пользователей и ценности")
+    export.add_argument("output", help="Путь к файлу выгрузки")
+    export.add_argument("--format", choices=("csv", "parquet"), default="csv")
+    export.add_argument("--batch-size", type=int, default=5000)
+
+    top = subparsers.add_parser("top", help="Самые частые ценности")
+    top.add_argument("--limit", type=int, default=20)
+
+    args = parser.parse_args()
+    if args.command == "top":
+        await print_top(args.limit)
+        return
+
+    exporter = export_parquet if args.format == "parquet" else export_csv
+    total = await exporter(args.output, args.batch_size)
+    print(f"Выгружено строк: {total} -> {args.output}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
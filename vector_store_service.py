@@ -1,42 +1,83 @@
 from docx import Document
-from langchain_core.documents import Document as LangchainDocument 
+from langchain_core.documents import Document as LangchainDocument
+from langchain_core.embeddings import Embeddings
 from langchain_openai import OpenAIEmbeddings
-from langchain_community.vectorstores import Chroma 
+from langchain_community.vectorstores import Chroma
 from langchain_experimental.text_splitter import SemanticChunker
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from config import settings
 
 
-def create_vectorstore(file_path: str, api_key: str):
-    """Полный пайплайн с явным API ключом"""
-    # 1. Чтение файла
+DEFAULT_CHUNK_SIZE = 1000
+DEFAULT_CHUNK_OVERLAP = 200
+DEFAULT_PERSIST_DIRECTORY = "./docx_vector_db"
+
+
+def load_docx_text(file_path: str) -> str:
+    """Текст всех непустых абзацев документа .docx"""
     doc = Document(file_path)
-    text = "\n".join([p.text for p in doc.paragraphs if p.text])
-    
-    # 2. Чанкинг
-    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-    chunks = splitter.split_text(text)
-    
-    # 3. Создание эмбеддингов с явным ключом
-    embeddings = OpenAIEmbeddings(
+    return "\n".join([p.text for p in doc.paragraphs if p.text])
+
+
+def split_recursive(
+    text: str,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    chunk_overlap: int = DEFAULT_CHUNK_OVERLAP
+) -> list[str]:
+    """Нарезка на чанки фиксированного размера по границам абзацев и предложений"""
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    return splitter.split_text(text)
+
+
+def split_semantic(text: str, embeddings: Embeddings, breakpoint_threshold_type: str = "percentile") -> list[str]:
+    """Нарезка по смысловым границам: чанк заканчивается там, где эмбеддинги соседних предложений расходятся"""
+    splitter = SemanticChunker(embeddings, breakpoint_threshold_type=breakpoint_threshold_type)
+    return splitter.split_text(text)
+
+
+def openai_embeddings(api_key: str) -> OpenAIEmbeddings:
+    return OpenAIEmbeddings(
         openai_api_key=api_key,
         model="text-embedding-3-small"
     )
-    
-    # 4. Сохранение в ChromaDB
-    vector_store = Chroma.from_texts(
+
+
+def build_vectorstore(
+    chunks: list[str],
+    embeddings: Embeddings,
+    persist_directory: str = DEFAULT_PERSIST_DIRECTORY,
+    collection_name: str = "langchain"
+) -> Chroma:
+    """Создает хранилище ChromaDB из готовых чанков"""
+    return Chroma.from_texts(
         texts=chunks,
         embedding=embeddings,
-        persist_directory="./docx_vector_db"
+        persist_directory=persist_directory,
+        collection_name=collection_name
     )
+
+
+def create_vectorstore(file_path: str, api_key: str):
+    """Полный пайплайн с явным API ключом"""
+    # 1. Чтение файла
+    text = load_docx_text(file_path)
+
+    # 2. Чанкинг
+    chunks = split_recursive(text)
+
+    # 3. Создание эмбеддингов с явным ключом
+    embeddings = openai_embeddings(api_key)
+
+    # 4. Сохранение в ChromaDB
+    vector_store = build_vectorstore(chunks, embeddings)
     return vector_store
 
 
 if __name__ == "__main__":
+    from config import settings
 
     # Явная передача ключа (на практике лучше брать из .env)
     api_key = settings.OPENAI_API_KEY
-    
+
     # Запуск обработки
     store = create_vectorstore("anxiety.docx", api_key)
-    print(f"Storage created at: {store._persist_directory}")
\ No newline at end of file
+    print(f"Storage created at: {store._persist_directory}")